@@ -1,8 +1,9 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import functools
 import logging  # from blender cloud addon
 from bpy.app.translations import pgettext_tip as tip_
-from bpy.props import PointerProperty, BoolProperty, StringProperty, IntProperty, CollectionProperty, EnumProperty
+from bpy.props import PointerProperty, BoolProperty, StringProperty, IntProperty, FloatProperty, CollectionProperty, EnumProperty
 from bpy.types import AddonPreferences, Context, Operator, PropertyGroup, Menu
 import bpy
 import typing
@@ -25,14 +26,41 @@ if 'communication' in locals():
     import importlib
 
     # noinspection PyUnboundLocalVariable
+    credentials = importlib.reload(credentials)
+    filelock = importlib.reload(filelock)
+    jsoncodec = importlib.reload(jsoncodec)
     communication = importlib.reload(communication)
+    ratelimit = importlib.reload(ratelimit)
     # noinspection PyUnboundLocalVariable
     profiles = importlib.reload(profiles)
+    batch_mode = importlib.reload(batch_mode)
+    jobs = importlib.reload(jobs)
+    handlers = importlib.reload(handlers)
+    keyframes = importlib.reload(keyframes)
+    object_pool = importlib.reload(object_pool)
+    node_builder = importlib.reload(node_builder)
     get_scripts = importlib.reload(get_scripts)
     clean_scene = importlib.reload(clean_scene)
+    mvx_query = importlib.reload(mvx_query)
     mvx_requests = importlib.reload(mvx_requests)
+    asset_cache = importlib.reload(asset_cache)
+    instancing = importlib.reload(instancing)
+    dedup = importlib.reload(dedup)
+    svg_import = importlib.reload(svg_import)
+    lod = importlib.reload(lod)
+    background = importlib.reload(background)
+    previews = importlib.reload(previews)
+    chunkstore = importlib.reload(chunkstore)
+    datastream = importlib.reload(datastream)
 else:
-    from . import communication, profiles, mvx_requests
+    from . import credentials, filelock, jsoncodec
+    from . import communication, ratelimit, profiles, mvx_query, mvx_requests
+    from . import batch_mode, handlers, jobs
+    from . import asset_cache, instancing, dedup, svg_import, lod, background, previews
+    from . import chunkstore, datastream
+    from .scripts import keyframes
+    from .scripts import object_pool
+    from .scripts import node_builder
     from .scripts import clean_scene
     from .scripts import get_scripts
 
@@ -84,6 +112,13 @@ def token_expires() -> typing.Optional[datetime.datetime]:
     exp = LockiIdProfile.expires
     if not exp:
         return None
+    return parse_expiry(exp)
+
+
+@functools.lru_cache(maxsize=8)
+def parse_expiry(exp: str) -> typing.Optional[datetime.datetime]:
+    """Parses a token expiry timestamp, cached as the preferences are drawn
+    again and again with the same one."""
 
     # Try parsing as different formats. A new Blender ID is coming,
     # which may change the format in which timestamps are sent.
@@ -143,6 +178,13 @@ class LockiIdPreferences(AddonPreferences):
         default='default',
         description='Formated enumeration of the NFTs',
     )# type: ignore
+    undo_mode: EnumProperty(
+        items=batch_mode.UNDO_MODES,
+        name='Undo for heavy operators',
+        default='STEP',
+        description='Undo recorded by the generators, NFT loading and scene cleanup',
+        update=lambda self, context: batch_mode.apply_undo_mode(self.undo_mode),
+    )# type: ignore
 
     def reset_messages(self):
         self.ok_message = ''
@@ -159,6 +201,8 @@ class LockiIdPreferences(AddonPreferences):
             sub = layout.row()
             sub.label(text=self.ok_message, icon='FILE_TICK')
 
+        layout.prop(self, 'undo_mode')
+
         active_profile = get_active_profile()
         if active_profile:
             expiry = token_expires()
@@ -236,44 +280,42 @@ class LockiIdLogin(LockiIdMixin, Operator):
    
 
     def execute(self, context):
-        import random
-        import string
-
         addon_prefs = self.addon_prefs(context)
+        address = addon_prefs.address
+        token = addon_prefs.token
+
+        # Malformed, expired or mismatching credentials fail without a round trip.
+        error = credentials.preflight(address, token)
+        if error is not None:
+            addon_prefs.error_message = error
+            return {'CANCELLED'}
+
+        def on_done(job):
+            addon_prefs = LockiIdMixin.addon_prefs(bpy.context)
+            auth_result = job.result
+            if job.succeeded and auth_result.success:
+                # JNS add the bearer token, signature, ...
+                profiles.save_as_active_profile(
+                    auth_result,
+                    address,
+                    token,
+                    {},
+                    "0",
+                )
+                addon_prefs.ok_message = tip_('Logged in')
+            else:
+                addon_prefs.error_message = auth_result.error_message if auth_result else job.error
+                if LockiIdProfile.address:
+                    profiles.logout(LockiIdProfile.address)
 
-        requests_session = None
-        auth_result = communication.locki_id_server_authenticate(
-            #address=addon_prefs.address,
-            token=addon_prefs.token,
-        )
-
-        if auth_result.success:
-            # Prevent saving the secret in user preferences. Overwrite the secret with a
-            # random string, as just setting to '' might only replace the first byte with 0.
-            # !!!! NO API secret !!!
-            # pwlen = len(addon_prefs.api_secret)
-            # rnd = ''.join(random.choice(string.ascii_uppercase + string.digits)
-            #               for _ in range(pwlen + 16))
-            # addon_prefs.api_secret = rnd
-            # addon_prefs.api_secret = ''
-            # JNS add the bearer token, signature, ...
-            profiles.save_as_active_profile(
-                auth_result,
-                addon_prefs.address,
-                addon_prefs.token,
-                {},
-                "0",
-            )
-            addon_prefs.ok_message = tip_('Logged in')
-        else:
-            addon_prefs.error_message = auth_result.error_message
-            if LockiIdProfile.address:
-                profiles.logout(LockiIdProfile.address)
+            # After logging in, call the update_nfts_data function to populate nfts_data
+            update_nfts_data(None, bpy.context)
 
-        # After logging in, call the update_nfts_data function to populate nfts_data
-        update_nfts_data(self, context)
+            LockiIdProfile.read_json()
 
-        LockiIdProfile.read_json()
+        jobs.submit(communication.locki_id_server_authenticate, token=token,
+                    name='login', priority=jobs.PRIORITY_HIGH, on_done=on_done)
+        addon_prefs.ok_message = tip_('Logging in...')
 
         return {'FINISHED'}
 
@@ -285,14 +327,27 @@ class LockiIdValidate(LockiIdMixin, Operator):
     def execute(self, context):
         addon_prefs = self.addon_prefs(context)
 
-        err = validate_token()
-        if err is None:
-            addon_prefs.ok_message = tip_('Authentication token is valid')
-        else:
+        error = credentials.preflight(LockiIdProfile.address, LockiIdProfile.token)
+        if error is not None:
             addon_prefs.error_message = tip_(
-                '%s; you probably want to log out and log in again') % err
+                '%s; you probably want to log out and log in again') % error
+            return {'CANCELLED'}
+
+        def on_done(job):
+            addon_prefs = LockiIdMixin.addon_prefs(bpy.context)
+            expires, err = job.result if job.succeeded else (None, job.error)
+            if err is None:
+                store_token_expiry(expires)
+                addon_prefs.ok_message = tip_('Authentication token is valid')
+            else:
+                addon_prefs.error_message = tip_(
+                    '%s; you probably want to log out and log in again') % err
 
-        LockiIdProfile.read_json()
+            LockiIdProfile.read_json()
+
+        jobs.submit(communication.locki_id_server_validate, token=LockiIdProfile.token,
+                    name='validate', priority=jobs.PRIORITY_HIGH, on_done=on_done)
+        addon_prefs.ok_message = tip_('Validating...')
 
         return {'FINISHED'}
 
@@ -309,20 +364,23 @@ def validate_token() -> typing.Optional[str]:
     if err is not None:
         return err
 
-    LockiIdProfile.expires = expires
-    LockiIdProfile.save_json()
+    store_token_expiry(expires)
 
     return None
 
+def store_token_expiry(expires):
+    LockiIdProfile.expires = expires
+    LockiIdProfile.save_json()
+
 class LockiIdLogout(LockiIdMixin, Operator):
     bl_idname = 'locki_id.logout'
     bl_label = 'Logout'
 
     def execute(self, context):
         addon_prefs = self.addon_prefs(context)
-        requests_session = None
-        communication.locki_id_server_logout(LockiIdProfile.address,
-                                             LockiIdProfile.token)
+        # The token is removed server-side in the background.
+        jobs.submit(communication.locki_id_server_logout,
+                    LockiIdProfile.address, LockiIdProfile.token, name='logout')
 
         profiles.logout(LockiIdProfile.address)
         LockiIdProfile.read_json()
@@ -339,16 +397,23 @@ class UTILS_OT_get_nonce(LockiIdMixin, bpy.types.Operator):
 
     def execute(self, context):
         addon_prefs = self.addon_prefs(context)
-        result = mvx_requests.check_address_nonce(LockiIdProfile.address)
-
-        if result:
-            
-            LockiIdProfile.nonce = result["nonce"]
-            addon_prefs.nonce = result["nonce"]
-            LockiIdProfile.save_json()
-        mvx_requests.show_message(str(LockiIdProfile.address), f"Nonce: {str(result['nonce'])}")
-
-        LockiIdProfile.read_json()
+        address = LockiIdProfile.address
+
+        def on_done(job):
+            if not job.succeeded:
+                mvx_requests.show_message(str(address), str(job.error))
+                return
+            result = job.result
+            if result:
+                addon_prefs = LockiIdMixin.addon_prefs(bpy.context)
+                LockiIdProfile.nonce = result["nonce"]
+                addon_prefs.nonce = result["nonce"]
+                LockiIdProfile.save_json()
+            mvx_requests.show_message(str(address), f"Nonce: {str(result['nonce'])}")
+
+            LockiIdProfile.read_json()
+
+        jobs.submit(mvx_requests.check_address_nonce, address, name='nonce', on_done=on_done)
         return {"FINISHED"}
 
 #def update_enum_nft_identifiers(self, context):
@@ -363,35 +428,108 @@ class UTILS_OT_get_nfts(LockiIdMixin, bpy.types.Operator):
     bl_label = "get urls from nfts"
     bl_options = {"REGISTER", "UNDO"}
 
+    max_age: FloatProperty(
+        name="Max age",
+        description="Reuse an inventory synced by any Blender instance less than this many "
+                    "seconds ago, 0 to always ask the API",
+        default=0.0,
+        min=0.0,
+        options={'SKIP_SAVE'},
+    ) # type: ignore
+
     def execute(self, context):
-        addon_prefs = self.addon_prefs(context)
-        locki = context.scene.locki
-        nft_list = mvx_requests.get_nftlist_from_address(LockiIdProfile.address)
-        nft_urls = mvx_requests.get_urllist_from_list(nft_list)
-
-        # store them into the profile 
-        LockiIdProfile.nfts = nft_urls
-
-        records = mvx_requests.transform_nft_urls_in_menu(nft_urls)
-        print(records)
-
-        # Update the nfts_enum property in addon preferences
-        # addon_prefs.nfts_enum = formatted_records
-        # debugging the result : 
-        # print(test)
-        count = len(records)-1
-        mvx_requests.show_message(LockiIdProfile.address, f"{count} NFTs loaded")
-        #content_menu_nft = mvx_requests.transform_nft_urls_in_menu(nft_urls)
-        #print(content_menu_nft)
-        #LockiIdPreferences.nfts_collection = content_menu_nft
-        # nfts_collection is readonly but I would like to do that:
-        #addon_prefs.nfts_collection = mvx_requests.transform_nft_urls_in_menu(nft_urls)
-        #expect a string enum not a list
-        LockiIdProfile.save_json()
-
-        addon_prefs.ok_message = tip_('You have loaded the NFTs')
-        LockiIdProfile.read_json()
+        address = LockiIdProfile.address
+        view = context.scene.locki.file_format
+
+        def on_done(job):
+            if not job.succeeded:
+                mvx_requests.show_message(address, str(job.error))
+                return
+            addon_prefs = LockiIdMixin.addon_prefs(bpy.context)
+
+            if view in mvx_query.VIEW_FILTERS:
+                # A subset of the inventory, stored apart from it
+                nft_urls = job.result
+                profiles.save_view_nfts(address, view, nft_urls)
+            else:
+                nft_urls, synced = job.result
+
+                # store them into the profile 
+                LockiIdProfile.nfts = nft_urls
+                LockiIdProfile.synced = synced
+                LockiIdProfile.save_json()
+
+            records = mvx_requests.transform_nft_urls_in_menu(nft_urls)
+            count = len(records)-1
+            mvx_requests.show_message(address, f"{count} NFTs loaded")
+
+            addon_prefs.ok_message = tip_('You have loaded the NFTs')
+            LockiIdProfile.read_json()
+
+        if view in mvx_query.VIEW_FILTERS:
+            # The data stream view is filtered on the server
+            fetch = functools.partial(mvx_requests.get_nft_urls_from_address, address, view)
+        else:
+            # Shared with the other Blender instances: automatic callers may
+            # reuse a recent sync of any of them instead of asking the API again.
+            fetch = functools.partial(
+                profiles.sync_nfts, address,
+                functools.partial(mvx_requests.get_nft_urls_from_address, address),
+                max_age=self.max_age)
+        jobs.submit(fetch, name='get_nfts', on_done=on_done)
+        return {"FINISHED"}
+
+class UTILS_OT_refresh_nfts(LockiIdMixin, bpy.types.Operator):
+    """Fetch again the details of some NFTs, e.g. after a metadata update"""
+
+    bl_idname = "utils.refresh_nfts"
+    bl_label = "Refresh NFT details"
+    bl_options = {"REGISTER"}
+
+    identifiers: StringProperty(
+        name="Identifiers",
+        description="Comma separated identifiers of the NFTs to refresh; "
+                    "the NFT selected in the panel when empty",
+    ) # type: ignore
+
+    def execute(self, context):
+        identifiers = [i.strip() for i in self.identifiers.split(',') if i.strip()]
+        if not identifiers and context.scene.locki.nfts_collection:
+            identifiers = [nft_identifier_for_url(context.scene.locki.nfts_collection)]
+        if not identifiers:
+            self.report({'ERROR'}, 'No NFT to refresh')
+            return {'CANCELLED'}
+
+        # One request per batch of identifiers, run in parallel; the profile
+        # is saved once all of them are back.
+        batches = mvx_query.plan_identifiers(identifiers)
+        remaining = [len(batches)]
+        refreshed = []
+        errors = []
+
+        def on_done(job):
+            if job.succeeded:
+                LockiIdProfile.nfts.update(job.result)
+                # the server-filtered views listed in the panel hold copies
+                for view_nfts in LockiIdProfile.view_nfts.values():
+                    view_nfts.update((identifier, nft) for identifier, nft in job.result.items()
+                                     if identifier in view_nfts)
+                refreshed.extend(job.result)
+            else:
+                errors.append(job.error)
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+            LockiIdProfile.save_json()
+            addon_prefs = LockiIdMixin.addon_prefs(bpy.context)
+            if errors:
+                addon_prefs.error_message = errors[0]
+            else:
+                addon_prefs.ok_message = tip_('%i NFTs refreshed') % len(refreshed)
 
+        for batch in batches:
+            jobs.submit(mvx_requests.get_nft_urls_from_identifiers, batch,
+                        name='refresh %i NFTs' % len(batch), on_done=on_done)
         return {"FINISHED"}
 
 import bpy
@@ -421,114 +559,168 @@ def load_url_as_object(url, file_format, location=(0,0,0)):
         print(f"Unsupported file format: {file_format}")
         return
     
-    if (file_format == 'GLB') or (file_format == 'GLTF') :
-        session = communication.load_nft_session()
-        r = session.get(url, verify=True)
-        if r.status_code == 200:
-            print(f"passed with 200")
-            # Use Blender's temporary directory
-            temp_dir = bpy.path.abspath("//temp")
-            os.makedirs(temp_dir, exist_ok=True)
-
-            # Construct the local file path for the downloaded file
-            file_name = os.path.basename(url)
-            local_path = os.path.join(temp_dir, file_name)
-
-            # Write the content of the response to the local file
-            with open(local_path, 'wb') as f:
-                f.write(r.content)
+    if file_format in {'GLB', 'GLTF', 'SVG'}:
+        col = instancing.find_nft_collection(url=url)
+        if col is not None and bpy.context.scene.locki.reuse_mode != 'IMPORT':
+            instancing.reuse_nft(col, bpy.context.scene.locki.reuse_mode, location)
+            return
+
+        def on_done(job):
+            if not job.succeeded:
+                print(f"Error in downloading the obj/mesh file: {job.error}")
+                return
+            local_path, digest = job.result
+            window, area = find_area('VIEW_3D')
+            with batch_mode.heavy_step(bpy.context, 'Load NFT', window, area):
+                import_nft_file(url, file_format, location, local_path, digest)
+
+        jobs.submit(asset_cache.fetch, url, name=url, on_done=on_done)
+
+    if file_format == 'PY':
+        if bpy.context.scene.locki.py_execution == 'BACKGROUND':
+            run_nft_script_in_background(url)
+            return
+
+        def on_done(job):
+            if not job.succeeded:
+                print(f"Error in downloading the python file: {job.error}")
+                return
+            local_path, digest = job.result
+            run_nft_script(url, local_path)
+
+        jobs.submit(asset_cache.fetch, url, name=url, on_done=on_done)
+
 
+def import_nft_file(url, file_format, location, local_path, digest):
+    """Imports the downloaded GLB, GLTF or SVG NFT file, or reuses the
+    objects of an identical file imported before.
+    """
+
+    nft_id = nft_identifier_for_url(url)
+    locki = bpy.context.scene.locki
+
+    col = instancing.find_nft_collection(digest=digest)
+    if col is not None and locki.reuse_mode != 'IMPORT':
+        instancing.reuse_nft(col, locki.reuse_mode, location)
+        return
+
+    objects_before = set(bpy.data.objects)
+    try:
+        if file_format == 'SVG':
+            imported = svg_import.import_svg(local_path, digest,
+                                             locki.svg_join, locki.svg_simplify)
+        else:
             # Import the downloaded GLB file as an object in Blender
-            bpy.ops.import_scene.gltf(filepath=local_path, filter_glob="*.glb")
-        else: 
-            print(f"Error in downloading the obj/mesh file: {r.status_code} - {r.text}")
+            batch_mode.run_op(bpy.ops.import_scene.gltf,
+                              filepath=local_path, filter_glob="*.glb")
+            imported = [obj for obj in bpy.data.objects if obj not in objects_before]
+    except Exception as e:
+        print(f"Error loading URL as object: {e}")
+        return
 
-    if file_format == 'PY':
-        session = communication.load_nft_session()
-        r = session.get(url, verify=True)
-        if r.status_code == 200:
-            print(f"passed with 200")
-            # Use Blender's temporary directory
-            temp_dir = bpy.path.abspath("//temp")
-            os.makedirs(temp_dir, exist_ok=True)
-
-            # Construct the local file path for the downloaded file
-            file_name = os.path.basename(url)
-            local_path = os.path.join(temp_dir, file_name)
-
-            # Write the content of the response to the local file
-            with open(local_path, 'wb') as f:
-                f.write(r.content)
-
-            try:
-                # Find the newly created Text Editor area
-                text_editor_area = None
-                # Iterate through all text data-blocks and unlink them
-                for text in bpy.data.texts:
-                    bpy.data.texts.remove(text)
-
-                # Create a new text block
-                new_text_block = bpy.data.texts.new(name=file_name)
-
-                # Load the content of the Python file into the text block
-                with open(local_path, 'r') as f:
-                    new_text_block.from_string(f.read())
-
-                for area in bpy.context.screen.areas:
-                    if area.type == 'TEXT_EDITOR':
-
-                        text = bpy.data.texts[file_name]
-                        text.use_fake_user = True  # Ensure the script is saved
-                        
-                        # Method 1 Switch to the Text Editor mode
-                        area.spaces[0].text = text # make loaded text file visible
-                        ctx = bpy.context.copy()
-                        ctx['edit_text'] = text
-                        ctx['area'] = area
-                        ctx['region'] = area.regions[-1] # ... just modify the view area
-                        # Crashes Blender
-                        # bpy.ops.text.run_script(ctx) #running the script
-
-                        bufferName = file_name
-                        lib = bpy.data.texts[bufferName].as_string()
-                        exec(lib)
-                        bpy.ops.screen.animation_play()
-                        break 
-
-            except Exception as e:
-                print(f"Error loading Python file in the text editor area: {e}")
-            finally:
-                clean_up_tempfile(temp_dir)
-
-        else: 
-            print(f"Error in downloading the python file: {r.status_code} - {r.text}")
-
-    elif file_format == 'SVG':
-        # Create a temporary directory to store the downloaded file
-        temp_dir = tempfile.mkdtemp()
-        try:
-            # Construct the local file path for the downloaded file
-            file_name = os.path.basename(url)
-            local_path = os.path.join(temp_dir, file_name)
-
-            # Download the file from the URL
-            urllib.request.urlretrieve(url, local_path)
-
-            # Import the downloaded file as an object in Blender
-            if file_format == 'OBJ':
-                bpy.ops.import_scene.obj(filepath=local_path)
-            elif file_format == 'FBX':
-                bpy.ops.import_scene.fbx(filepath=local_path)
-            elif file_format == 'STL':
-                bpy.ops.import_mesh.stl(filepath=local_path)
-            elif file_format == 'SVG':
-                bpy.ops.import_curve.svg(filepath=local_path , filter_glob="*.svg")
-            # Add more import formats as needed
-
-        except Exception as e:
-            print(f"Error loading URL as object: {e}")
-        finally:
-            clean_up_tempfile(temp_dir)
+    instancing.tag_imported(imported, nft_id, url, digest)
+    if file_format != 'SVG' and locki.generate_lods:
+        lod.generate_lods(imported, digest, min_faces=locki.lod_min_faces,
+                          level=locki.lod_level)
+    if locki.dedup_after_import:
+        dedup.dedup_imported(imported)
+
+
+def find_area(area_type):
+    """Returns (window, area) of the first area of the given type in the open
+    windows, or (None, None). Job callbacks run from a timer, where
+    bpy.context.screen is None, so the windows are searched instead.
+    """
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == area_type:
+                return window, area
+    return None, None
+
+
+def run_nft_script(url, local_path):
+    """Loads the downloaded PY NFT into the Text Editor and runs it."""
+
+    file_name = os.path.basename(url)
+    window, area = find_area('TEXT_EDITOR')
+    if area is None:
+        mvx_requests.show_message(file_name, tip_('Open a Text Editor to run PY NFTs'))
+        return
+
+    try:
+        # Iterate through all text data-blocks and unlink them
+        for text in bpy.data.texts:
+            bpy.data.texts.remove(text)
+
+        # Create a new text block
+        new_text_block = bpy.data.texts.new(name=file_name)
+
+        # Load the content of the Python file into the text block
+        with open(local_path, 'r') as f:
+            new_text_block.from_string(f.read())
+
+        text = bpy.data.texts[file_name]
+        text.use_fake_user = True  # Ensure the script is saved
+
+        with bpy.context.temp_override(window=window, area=area):
+            # Method 1 Switch to the Text Editor mode
+            area.spaces[0].text = text # make loaded text file visible
+            # Crashes Blender
+            # bpy.ops.text.run_script(ctx) #running the script
+
+            lib = text.as_string()
+            exec(lib)
+            # time the frame handlers of the script, once per name
+            handlers.adopt_handlers()
+            bpy.ops.screen.animation_play()
+
+    except Exception as e:
+        print(f"Error loading Python file in the text editor area: {e}")
+        mvx_requests.show_message(file_name, str(e))
+
+
+def run_nft_script_in_background(url):
+    """Runs the PY NFT at url in a background Blender and appends (or links)
+    the objects it generates once it is done. Returns immediately.
+    """
+    import time
+
+    locki = bpy.context.scene.locki
+    name = nft_identifier_for_url(url)
+    link = locki.py_link
+    time_limit = locki.py_time_limit
+    memory_limit_mb = locki.py_memory_limit
+
+    def on_done(job):
+        if job.error_message:
+            print(f"Error running {name} in the background: {job.error_message}")
+            mvx_requests.show_message(name, job.error_message)
+        if os.path.exists(job.output_path):
+            background.load_result(job.output_path, name, link)
+            if not link:
+                os.remove(job.output_path)
+
+    def on_fetched(job):
+        if not job.succeeded:
+            print(f"Error in downloading the python file: {job.error}")
+            return
+        local_path, digest = job.result
+        output_path = asset_cache.blend_path(digest, 'py-%i' % time.time())
+        background.run_script(local_path, output_path,
+                              time_limit=time_limit,
+                              memory_limit_mb=memory_limit_mb,
+                              on_done=on_done)
+
+    jobs.submit(asset_cache.fetch, url, name=url, on_done=on_fetched)
+
+def nft_identifier_for_url(url):
+    """Returns the identifier of the NFT in the active profile owning url,
+    or the file name when the url is not part of the profile.
+    """
+    for identifier, data in LockiIdProfile.nfts.items():
+        if url in data.values():
+            return identifier
+    return os.path.basename(url)
 
 def clean_up_tempfile(temp_dir):
 # Clean up: remove the temporary directory and its contents
@@ -538,6 +730,7 @@ def clean_up_tempfile(temp_dir):
                 os.remove(os.path.join(root, file))
         os.rmdir(temp_dir)
 
+@batch_mode.heavy_operator
 class UTILS_OT_load_nft(LockiIdMixin, bpy.types.Operator):
 
 
@@ -603,12 +796,23 @@ class VIEW3D_PT_locki_panel(LockiIdMixin, bpy.types.Panel):
         locki = context.scene.locki
         """define the layout of the panel"""
         layout = self.layout
+        pending = jobs.pending_jobs()
+        if pending:
+            layout.label(text=tip_('%i requests running') % len(pending), icon='SORTTIME')
+            col = layout.column(align=True)
+            for host in ratelimit.stats():
+                text = tip_('%s: %i/%i parallel, %.0f ms') % (
+                    host['host'], host['in_flight'], host['limit'], host['latency_ms'])
+                if host['blocked_for']:
+                    text += tip_(', retry in %is') % host['blocked_for']
+                col.label(text=text, icon='URL')
         # print('is logged :' + str(is_logged_in()))
         if is_logged_in():
             row = layout.row()
             row.operator("utils.get_nonce", text="Check MvX nonce")
             row = layout.row()
             row.operator("utils.get_nfts", text="Get MvX nfts")
+            row.operator("utils.refresh_nfts", text="", icon='FILE_REFRESH')
 
             # Access the items in AddonPreferences and populate the combobox
             # preferences = context.preferences.addons[__name__].preferences            
@@ -626,17 +830,48 @@ class VIEW3D_PT_locki_panel(LockiIdMixin, bpy.types.Panel):
                               icon=('TRIA_DOWN' if locki.ui_expanded_nft else 'TRIA_RIGHT'))
             if locki.ui_expanded_nft:
                 box.prop(locki,"nfts_collection", text="my NFTs",icon='COLLECTION_NEW', emboss=True)
+                icon_id = previews.get_icon_id(locki.nfts_collection)
+                if icon_id:
+                    box.template_icon(icon_value=icon_id, scale=6.0)
                 row = box.row(align=True)
                 row.prop(locki, "file_format")
+                row = box.row(align=True)
+                row.prop(locki, "reuse_mode")
+                row = box.row(align=True)
+                row.prop(locki, "dedup_after_import")
+                row.operator("utils.dedup_data", text="", icon='TRASH')
+                if locki.file_format in {'none', '.gltf'}:
+                    row = box.row(align=True)
+                    row.prop(locki, "generate_lods")
+                    row.prop(locki, "lod_min_faces")
+                    row = box.row(align=True)
+                    row.prop(locki, "lod_level")
+                if locki.file_format in {'none', '.py'}:
+                    row = box.row(align=True)
+                    row.prop(locki, "py_execution")
+                    if locki.py_execution == 'BACKGROUND':
+                        row.prop(locki, "py_link")
+                        row = box.row(align=True)
+                        row.prop(locki, "py_time_limit")
+                        row.prop(locki, "py_memory_limit")
+                if locki.file_format in {'none', '.svg'}:
+                    row = box.row(align=True)
+                    row.prop(locki, "svg_join")
+                    row.prop(locki, "svg_simplify")
                 #row = box.row(align=True)
                 #row.prop(locki, "my_selected_nft", text="url")
                 row = box.row(align=True)
                 row.operator("utils.load_nft", text="LOAD")
+                if "dataNftView" in locki.nfts_collection:
+                    op = row.operator("utils.fetch_datastream", text="", icon='IMPORT')
+                    op.identifier = nft_identifier_for_url(locki.nfts_collection)
  
             # Use your scene property ??? really 
             
-        row = self.layout.row()
+        row = self.layout.row(align=True)
         row.operator("mesh.clean_scene", text="Clear Scene")
+        row.operator("mesh.save_scene_template", text="", icon='FILE_TICK')
+        row.operator("mesh.remove_scene_template", text="", icon='X')
         self.layout.separator()
         row = self.layout.row()
         row.operator("mesh.primitive_cube_add", text="Add Cube")
@@ -659,8 +894,10 @@ def update_nfts_data(self, context):
     items = []  # Clear the collection first
     stream_only = False
     data_nft = context.scene.locki.nfts_data
-    # Access LockiIdProfile.nfts and populate nfts_data
-    for identifier, data in LockiIdProfile.nfts.items():
+    # Access LockiIdProfile.nfts and populate nfts_data, or the NFTs fetched
+    # for a server-filtered view
+    nfts = LockiIdProfile.view_nfts.get(context.scene.locki.file_format, LockiIdProfile.nfts)
+    for identifier, data in nfts.items():
         compatible_extensions = ['.svg', '.glb', '.gltf', '.py', '.step']
         filter_on = context.scene.locki.file_format
         if filter_on == 'none':
@@ -714,6 +951,83 @@ class SceneProperties(PropertyGroup):
         ),
         default='none',
     ) # type: ignore
+    reuse_mode: EnumProperty(
+        name="Reuse",
+        description="What LOAD does when the NFT is already in the file",
+        items=(
+            ('INSTANCE', "Collection Instance", "Add an empty instancing the NFT collection"),
+            ('LINKED', "Linked Duplicates", "Copy the objects, sharing their mesh, material and image data"),
+            ('IMPORT', "Import Again", "Always import a full new copy"),
+        ),
+        default='INSTANCE',
+    ) # type: ignore
+    dedup_after_import: BoolProperty(
+        name="Merge Duplicates",
+        description="After LOAD, merge meshes, materials and images identical to ones of NFTs loaded before",
+        default=False,
+    ) # type: ignore
+    svg_join: EnumProperty(
+        name="SVG Paths",
+        description="How the paths of an SVG NFT are turned into objects",
+        items=(
+            ('NONE', "One Curve per Path", "Keep the objects created by the SVG importer"),
+            ('CURVE', "Single Curve", "Join all paths into one curve object"),
+            ('MESH', "Single Mesh", "Join all paths into one mesh object"),
+        ),
+        default='NONE',
+    ) # type: ignore
+    svg_simplify: FloatProperty(
+        name="Simplify",
+        description="Drop SVG points closer than this distance along the path when joining (0 to keep all)",
+        default=0.0,
+        min=0.0,
+        subtype='DISTANCE',
+    ) # type: ignore
+    generate_lods: BoolProperty(
+        name="Viewport LODs",
+        description="Show decimated copies of heavy GLB meshes in the viewport, the full mesh is still rendered",
+        default=True,
+    ) # type: ignore
+    lod_min_faces: IntProperty(
+        name="Min Faces",
+        description="Only meshes with at least this many faces get LODs",
+        default=100000,
+        min=0,
+    ) # type: ignore
+    lod_level: IntProperty(
+        name="Viewport LOD",
+        description="LOD level shown in the viewport: 0 full mesh, 1 50%, 2 10%, 3 1% of the faces",
+        default=2,
+        min=0,
+        max=len(lod.DEFAULT_RATIOS),
+        update=lod.update_lod_level,
+    ) # type: ignore
+    py_execution: EnumProperty(
+        name="Run PY",
+        description="Where the script of a PY NFT is executed",
+        items=(
+            ('INTERACTIVE', "In this Blender", "Run the script in this session and start playback"),
+            ('BACKGROUND', "In Background", "Run the script in a background Blender and append its result"),
+        ),
+        default='INTERACTIVE',
+    ) # type: ignore
+    py_link: BoolProperty(
+        name="Link",
+        description="Link the generated objects instead of appending them",
+        default=False,
+    ) # type: ignore
+    py_time_limit: IntProperty(
+        name="Time Limit",
+        description="Seconds after which the background script is stopped (0 for no limit)",
+        default=300,
+        min=0,
+    ) # type: ignore
+    py_memory_limit: IntProperty(
+        name="Memory Limit (MB)",
+        description="Memory the background Blender may use (0 for no limit, Linux and macOS only)",
+        default=4096,
+        min=0,
+    ) # type: ignore
     ui_expanded_nft: BoolProperty(
         name="Show Nfts Expanded",
         description="Shows the box 'Nfts choice' expanded in user interface",
@@ -742,49 +1056,32 @@ class SceneProperties(PropertyGroup):
         #update=update_selected_nft_url
     ) # type: ignore
  
+# Longest URL passed to the browser; longer selections are handed off
+# through the clipboard instead.
+AI_MAX_URL_LENGTH = 2000
+AI_CHAT_URL = 'https://chat.locki.io'
+
+
 def get_selected_text():
-    import re
-    # Check if we are in the Text Editor
-    if bpy.context.area.type == 'TEXT_EDITOR':
-        # Get the active text data-block
-        text = bpy.context.space_data.text
-
-        # Check if any text is selected
-        if text:
-            text_selection = bpy.context.edit_text
-            active_text = bpy.context.area.spaces.active.text
-            # Set the selection range
-            cli = text_selection.current_line_index
-            eli = text_selection.select_end_line_index
-            store_text = ''
-            # Define a regular expression pattern to match tabs
-            tab_pattern = re.compile(r'    ')
-
-            if  cli <= eli:
-                while cli <= eli:
-                    store_text += tab_pattern.sub(r'\t',text_selection.current_line.body)
-                    store_text += '\n'
-                    cli += 1
-                    text_selection.select_set(line_start=cli, char_start=0,  line_end=cli+1, char_end=0)
-            else:
-                text_selection.select_set(line_start=eli, char_start=0,  line_end=eli, char_end=0)
-                temp = cli
-                cli = eli
-                eli = temp
-                while cli <= eli:
-                    store_text += tab_pattern.sub(r'\t',text_selection.current_line.body)
-                    store_text += '\n'
-                    cli += 1
-                    text_selection.select_set(line_start=cli, char_start=0,  line_end=cli+1, char_end=0)
-                      
-            # Replace tabs with spaces to preserve indentation
-            store_text = store_text.replace('\t', '\\t')
-            store_text = store_text.replace('\n', '\\n')
-            text_selection.select_set(line_start=cli, char_start=0,  line_end=eli+1, char_end=0)
-           
-            return store_text
-    # If not in the Text Editor or no text is selected, return None
-    return None
+    """Returns the lines of the Text Editor selection, or None.
+
+    The lines are sliced from text.lines using the selection indices, the
+    cursor of the text editor is not moved. The text is escaped as the chat
+    expects it: indents of four spaces become a literal '\\t' and every
+    line ends with a literal '\\n'.
+    """
+
+    context = bpy.context
+    if context.area is None or context.area.type != 'TEXT_EDITOR':
+        return None
+    text = context.space_data.text
+    if text is None:
+        return None
+
+    first, last = sorted((text.current_line_index, text.select_end_line_index))
+    return ''.join(line.body.replace('    ', r'\t') + r'\n'
+                   for line in text.lines[first:last + 1])
+
 
 class AiOperator(Operator):
     bl_idname = "text.ai_operator"
@@ -793,9 +1090,18 @@ class AiOperator(Operator):
     def execute(self, context):
         # Your custom operator logic goes here
         import webbrowser
-        locki = context.scene.locki
+
         helpMeString = get_selected_text()
-        ai_help_url = 'https://chat.locki.io?string=' + helpMeString 
+        if helpMeString is None:
+            self.report({'ERROR'}, 'Select some lines in the Text Editor')
+            return {'CANCELLED'}
+
+        ai_help_url = AI_CHAT_URL + '?string=' + helpMeString
+        if len(ai_help_url) > AI_MAX_URL_LENGTH:
+            # Too long for a GET query: hand the script over through the clipboard.
+            context.window_manager.clipboard = helpMeString
+            ai_help_url = AI_CHAT_URL
+            self.report({'INFO'}, 'Selection copied to the clipboard, paste it in the chat')
         webbrowser.open(ai_help_url)
 
         return {'FINISHED'}
@@ -813,14 +1119,21 @@ module_classes = (
     LockiIdValidate,
 
     UTILS_OT_get_nfts, # register utility operators
+    UTILS_OT_refresh_nfts, # register utility operators
     UTILS_OT_get_nonce, # Register utility operators
     UTILS_OT_load_nft, # Let us load !
+    dedup.UTILS_OT_dedup_data, # Merge duplicate NFT data
+    datastream.UTILS_OT_fetch_datastream, # Download Data NFT datastreams
 
     get_scripts.MESH_OT_add_subdiv_monkey, # Register mesh and scene utilities
     get_scripts.MESH_OT_add_rotating_cube_obj, # Register mesh and scene utilities
     clean_scene.MESH_OT_clean_scene, # Register mesh and scene utilities
+    clean_scene.MESH_OT_save_scene_template, # Register mesh and scene utilities
+    clean_scene.MESH_OT_remove_scene_template, # Register mesh and scene utilities
 
     VIEW3D_PT_locki_panel, # register panel
+    handlers.VIEW3D_PT_locki_performance, # frame handler timings
+    handlers.UTILS_OT_reset_handler_stats,
     #AiLockiTextEditorMenu,
     AiOperator
 
@@ -830,6 +1143,10 @@ module_classes = (
 def register():
     # Register profile and data-related functionalities
     profiles.register()
+    asset_cache.register()
+    previews.register()
+    datastream.register()
+    handlers.register()
 
     for cls in module_classes:
         bpy.utils.register_class(cls)
@@ -842,6 +1159,7 @@ def register():
     # Reset messages or any final initialization
     preferences = LockiIdMixin.addon_prefs(bpy.context)
     preferences.reset_messages()
+    batch_mode.apply_undo_mode(preferences.undo_mode)
 
 
 def unregister():
@@ -851,6 +1169,11 @@ def unregister():
     preferences = LockiIdMixin.addon_prefs(bpy.context)
     preferences.reset_messages()  # Assuming you might want to clean up some stuff during unregister as well.
     bpy.types.TEXT_MT_context_menu.remove(ai_menu_func)
+    background.cancel_all()
+    profiles.unregister()
+    jobs.cancel_all()
+    previews.unregister()
+    handlers.unregister()
 
     # Unregister Classes in reverse order
     for cls in reversed(module_classes):
@@ -0,0 +1,171 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Local cache of downloaded NFT files, keyed by the hash of their content.
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+import bpy
+
+from . import communication
+from . import filelock
+from . import jsoncodec
+
+log = logging.getLogger(__name__)
+
+# Set/created upon register.
+cache_path = ''
+
+# Downloads younger than this, in seconds, are reused without asking the
+# server again, also by the other Blender instances sharing the cache.
+MAX_AGE = 3600
+# Seconds to wait for another instance downloading the same url.
+LOCK_TIMEOUT = 120.0
+
+
+def register():
+    global cache_path
+
+    cache_path = bpy.utils.user_resource(
+        'CONFIG', path=os.path.join('locki_id', 'cache'), create=True)
+
+
+def content_hash(data: bytes) -> str:
+    """Returns the hex digest used to identify NFT content in the cache."""
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def cached_file(digest, extension):
+    """Returns the path of the cached file for the given hash, or None
+    when it was not downloaded yet.
+    """
+
+    path = os.path.join(cache_path, digest + extension)
+    if os.path.exists(path):
+        return path
+    return None
+
+
+def _index_path():
+    return os.path.join(cache_path, 'index.json')
+
+
+def _read_index():
+    try:
+        with open(_index_path(), 'r', encoding='utf8') as f:
+            return jsoncodec.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        log.warning('Resetting the malformed cache index %s', _index_path())
+        return {}
+
+
+def _record_download(url, digest, extension):
+    with filelock.locked(_index_path()):
+        index = _read_index()
+        index[url] = dict(digest=digest, extension=extension, fetched=time.time())
+        filelock.atomic_write(_index_path(), jsoncodec.dumps(index), mode=0o644)
+
+
+def fetch(url):
+    """Downloads the file at url into the cache, unless it was downloaded
+    less than MAX_AGE seconds ago. Blender instances fetching the same url
+    at once wait for the first one and reuse its download.
+
+    @returns: tuple (local_path, content_hash)
+    @raises communication.LockiIdCommError: when the download fails, or
+        another instance is still downloading it after LOCK_TIMEOUT seconds.
+    """
+
+    url_key = hashlib.sha1(url.encode('utf8')).hexdigest()
+    try:
+        with filelock.locked(os.path.join(cache_path, 'locks', url_key),
+                             timeout=LOCK_TIMEOUT):
+            entry = _read_index().get(url)
+            if entry and time.time() - entry['fetched'] < MAX_AGE:
+                local_path = cached_file(entry['digest'], entry['extension'])
+                if local_path is not None:
+                    return local_path, entry['digest']
+            return _download(url)
+    except filelock.LockTimeout:
+        raise communication.LockiIdCommError(
+            'Another Blender instance is still downloading %s' % url)
+
+
+def _download(url):
+    import requests.exceptions
+
+    session = communication.load_nft_session()
+    try:
+        r = session.get(url, verify=True, timeout=communication.REQUESTS_TIMEOUT)
+    except (requests.exceptions.HTTPError,
+            requests.exceptions.ConnectionError) as e:
+        raise communication.LockiIdCommError(str(e))
+
+    if r.status_code != 200:
+        raise communication.LockiIdCommError(
+            'Error downloading %s: %s' % (url, r.status_code))
+
+    digest = content_hash(r.content)
+    _, extension = os.path.splitext(os.path.basename(url))
+    local_path = cached_file(digest, extension.lower())
+    if local_path is None:
+        os.makedirs(cache_path, exist_ok=True)
+        local_path = os.path.join(cache_path, digest + extension.lower())
+        filelock.atomic_write(local_path, r.content, mode=0o644)
+        log.info('Cached %s as %s', url, local_path)
+    _record_download(url, digest, extension.lower())
+
+    return local_path, digest
+
+
+def blend_path(digest, kind):
+    """Returns the path of the .blend holding data derived from the NFT
+    content with the given hash, such as its parsed SVG curves.
+    """
+
+    return os.path.join(cache_path, '%s.%s.blend' % (digest, kind))
+
+
+def write_objects(digest, kind, objects):
+    """Stores the objects (or any other datablocks), and the data they use,
+    in the cache. The .blend is written next to its final path and moved in
+    place, so other instances never append from a partly written file.
+    """
+
+    os.makedirs(cache_path, exist_ok=True)
+    path = blend_path(digest, kind)
+    with filelock.locked(path):
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path, prefix='.' + os.path.basename(path),
+                                        suffix='.blend')
+        os.close(fd)
+        try:
+            bpy.data.libraries.write(tmp_path, set(objects), compress=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    log.info('Cached %d datablocks as %s', len(objects), path)
+
+
+def append_objects(digest, kind, attr='objects'):
+    """Appends the datablocks stored by write_objects() to the blend file,
+    without linking them to a scene. Returns None when not cached.
+
+    @param attr: the bpy.data collection to append from, e.g. 'meshes'.
+    """
+
+    path = blend_path(digest, kind)
+    if not os.path.exists(path):
+        return None
+
+    # Windows cannot replace a file while it is being read.
+    with filelock.locked(path, shared=True), \
+            bpy.data.libraries.load(path, link=False) as (data_from, data_to):
+        setattr(data_to, attr, list(getattr(data_from, attr)))
+    return [datablock for datablock in getattr(data_to, attr) if datablock is not None]
@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Runs downloaded PY NFTs in a background Blender process, so a heavy or
+# crashing generative script does not freeze or take down the session.
+
+import logging
+import os
+import subprocess
+import time
+
+import bpy
+
+log = logging.getLogger(__name__)
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(__file__), 'scripts', 'run_nft_script.py')
+
+# Seconds between two checks of the running processes.
+POLL_INTERVAL = 0.5
+
+# Jobs whose process is still running, polled by a bpy.app.timers callback.
+_running = []
+
+
+class BackgroundJob:
+    def __init__(self, *, process, output_path, log_path, time_limit, on_done):
+        self.process = process
+        self.output_path = output_path
+        self.log_path = log_path
+        self.time_limit = time_limit
+        self.on_done = on_done
+        self.started = time.monotonic()
+        self.error_message = None
+
+    def finish(self, returncode):
+        if self.error_message is None and returncode != 0:
+            self.error_message = 'Script failed with exit code %s, see %s' % (
+                returncode, self.log_path)
+        if self.on_done is not None:
+            self.on_done(self)
+
+
+def _memory_limiter(memory_limit_mb):
+    def preexec():
+        import resource
+
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return preexec
+
+
+def blender_command(python_script, *args):
+    """Returns the command line running python_script in a background
+    Blender of the same version as this one.
+    """
+
+    return [bpy.app.binary_path, '--background', '--factory-startup',
+            '--python', python_script, '--', *args]
+
+
+def start_process(command, log_path, memory_limit_mb=0):
+    """Starts a background Blender, logging its output to log_path.
+
+    The memory limit is only applied on POSIX systems.
+    """
+
+    kwargs = {}
+    if memory_limit_mb:
+        if os.name == 'posix':
+            kwargs['preexec_fn'] = _memory_limiter(memory_limit_mb)
+        else:
+            log.warning('Memory limit is not supported on this platform')
+
+    # Output goes to a file, a full pipe would block the process.
+    with open(log_path, 'wb') as log_file:
+        return subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, **kwargs)
+
+
+def _poll():
+    now = time.monotonic()
+    for job in list(_running):
+        returncode = job.process.poll()
+        if returncode is None:
+            if not job.time_limit or now - job.started < job.time_limit:
+                continue
+            job.process.kill()
+            returncode = job.process.wait()
+            job.error_message = 'Script stopped after the %i seconds time limit' % job.time_limit
+        _running.remove(job)
+        try:
+            job.finish(returncode)
+        except Exception:
+            log.exception('Error finishing background job %s', job.output_path)
+
+    return POLL_INTERVAL if _running else None
+
+
+def run_script(script_path, output_path, *, time_limit=0, memory_limit_mb=0, on_done=None):
+    """Runs the PY NFT script in a background Blender, which saves the
+    generated scene to output_path. on_done(job) is called on the main
+    thread when the process exits.
+    """
+
+    log_path = output_path + '.log'
+    process = start_process(blender_command(RUNNER_SCRIPT, script_path, output_path),
+                            log_path, memory_limit_mb)
+    job = BackgroundJob(process=process, output_path=output_path, log_path=log_path,
+                        time_limit=time_limit, on_done=on_done)
+    _running.append(job)
+    if not bpy.app.timers.is_registered(_poll):
+        bpy.app.timers.register(_poll, first_interval=POLL_INTERVAL)
+    return job
+
+
+def load_result(blend_path, name, link=False):
+    """Appends (or links) the objects of a .blend written by a background
+    job into a new collection of the current scene.
+    """
+
+    with bpy.data.libraries.load(blend_path, link=link) as (data_from, data_to):
+        data_to.objects = list(data_from.objects)
+
+    col = bpy.data.collections.new(name)
+    bpy.context.scene.collection.children.link(col)
+    objects = [obj for obj in data_to.objects if obj is not None]
+    for obj in objects:
+        col.objects.link(obj)
+    return objects
+
+
+def cancel_all():
+    """Kills the processes still running, e.g. when the add-on is disabled."""
+
+    for job in _running:
+        job.process.kill()
+    _running.clear()
+    if bpy.app.timers.is_registered(_poll):
+        bpy.app.timers.unregister(_poll)
@@ -0,0 +1,87 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Undo handling of the heavy operators (generators, NFT loading, cleanup).
+#
+# A Blender undo step of a big import or generator copies the whole
+# database, which doubles the memory. In the 'NONE' undo mode the heavy
+# operators are registered without the UNDO option, and heavy work done
+# outside of an operator records no undo step. The user preferences are
+# left alone.
+
+import contextlib
+
+import bpy
+
+UNDO_MODES = [
+    ('STEP', 'Single undo step',
+     'Heavy operators record one undo step covering all of their work'),
+    ('NONE', 'No undo',
+     'Heavy operators record no undo step, keeping the memory low for large loads'),
+]
+
+# bl_idname -> operator class
+HEAVY_OPERATORS = {}
+
+_undo_mode = 'STEP'
+
+
+def run_op(op, **kwargs):
+    """Runs the operator op, e.g. bpy.ops.import_scene.gltf, without an undo
+    push of its own (operators called from Python default to no undo): the
+    heavy step running it records one for all its work.
+    """
+    return op('EXEC_DEFAULT', **kwargs)
+
+
+@contextlib.contextmanager
+def heavy_step(context, message, window=None, area=None):
+    """Runs heavy work done outside of an operator, like an import started
+    when a download finishes, as a single undo step, or none in the 'NONE'
+    undo mode. Operators called in the block go through run_op().
+
+    Timer callbacks have no window in their context: the caller passes the
+    window (and area) to record the step in. Without any, no step is pushed.
+    """
+
+    yield
+    if _undo_mode == 'NONE':
+        return
+    window = window or context.window
+    if window is None:
+        return
+    override = dict(window=window, screen=window.screen)
+    if area is not None:
+        override['area'] = area
+    with context.temp_override(**override):
+        bpy.ops.ed.undo_push(message=message)
+
+
+def heavy_operator(cls):
+    """Class decorator of the operators following the undo mode of the
+    preferences, see apply_undo_mode()."""
+
+    HEAVY_OPERATORS[cls.bl_idname] = cls
+    return cls
+
+
+def apply_undo_mode(mode):
+    """Sets the undo mode, re-registering the heavy operators whose options change."""
+
+    global _undo_mode
+    _undo_mode = mode
+
+    for cls in HEAVY_OPERATORS.values():
+        options = set(cls.bl_options)
+        if mode == 'NONE':
+            options.discard('UNDO')
+        else:
+            options.add('UNDO')
+        if options == set(cls.bl_options):
+            continue
+
+        # bl_options are only read when the class is registered.
+        registered = cls.is_registered
+        if registered:
+            bpy.utils.unregister_class(cls)
+        cls.bl_options = options
+        if registered:
+            bpy.utils.register_class(cls)
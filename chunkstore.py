@@ -0,0 +1,211 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Resumable chunked downloads into a local chunk store.
+#
+# A stream is fetched in fixed-size chunks with HTTP Range requests, so an
+# interrupted download resumes where it stopped. Each chunk is hashed, the
+# hashes are kept in a manifest next to the data, and consumers read the
+# data through a memory map instead of loading it in memory. Only needs the
+# standard library and a requests session, see datastream.py for Blender.
+
+import contextlib
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+
+from . import filelock
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class StreamError(Exception):
+    """The server did not serve the stream as expected."""
+
+
+class ChunkStore:
+    """The local copy of a stream: a data file of the size of the stream,
+    and a JSON manifest of the chunks written to it with their sha256.
+    """
+
+    def __init__(self, directory, key):
+        name = hashlib.sha1(key.encode('utf8')).hexdigest()
+        self.directory = directory
+        self.data_path = os.path.join(directory, name + '.bin')
+        self.manifest_path = os.path.join(directory, name + '.json')
+        self.manifest = dict(url='', size=None, etag='', content_type='', chunks={}, sha256='')
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf8') as f:
+                self.manifest.update(json.load(f))
+
+    @property
+    def size(self):
+        return self.manifest['size']
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // CHUNK_SIZE) if self.size else 0
+
+    @property
+    def complete(self) -> bool:
+        return self.size is not None and len(self.manifest['chunks']) == self.chunk_count
+
+    def missing_chunks(self):
+        return [index for index in range(self.chunk_count)
+                if str(index) not in self.manifest['chunks']]
+
+    def reset(self, url, size, etag, content_type):
+        """Starts over, for a new stream or one that changed on the server."""
+
+        self.manifest = dict(url=url, size=size, etag=etag, content_type=content_type,
+                             chunks={}, sha256='')
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.data_path, 'wb') as f:
+            if size:
+                f.truncate(size)
+        self.save_manifest()
+
+    def write_chunk(self, index, data):
+        with open(self.data_path, 'r+b') as f:
+            f.seek(index * CHUNK_SIZE)
+            f.write(data)
+        self.manifest['chunks'][str(index)] = hashlib.sha256(data).hexdigest()
+        self.save_manifest()
+
+    def save_manifest(self):
+        filelock.atomic_write(self.manifest_path, json.dumps(self.manifest), mode=0o644)
+
+    def verify(self) -> bool:
+        """Re-hashes the chunks written so far, forgetting the ones that do
+        not match so they are fetched again. Returns whether all matched.
+        """
+        if not self.manifest['chunks']:
+            return True
+        chunks = self.manifest['chunks']
+        with self.open() as data:
+            bad = [index for index, digest in chunks.items()
+                   if hashlib.sha256(data[int(index) * CHUNK_SIZE:
+                                          (int(index) + 1) * CHUNK_SIZE]).hexdigest() != digest]
+        for index in bad:
+            del chunks[index]
+        if bad:
+            log.warning('%i corrupt chunks in %s', len(bad), self.data_path)
+            self.manifest['sha256'] = ''
+            self.save_manifest()
+        return not bad
+
+    def finish(self):
+        """Records the sha256 of the complete stream."""
+
+        digest = hashlib.sha256()
+        with self.open() as data:
+            for start in range(0, len(data), CHUNK_SIZE):
+                digest.update(data[start:start + CHUNK_SIZE])
+        self.manifest['sha256'] = digest.hexdigest()
+        self.save_manifest()
+
+    @contextlib.contextmanager
+    def open(self):
+        """Yields a read-only memory map of the data."""
+
+        with open(self.data_path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                yield b''
+                return
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield data
+            finally:
+                data.close()
+
+
+def _content_range_size(response):
+    match = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+
+def _read_exact(chunks, size):
+    """Regroups the pieces of iter_content into blocks of exactly size bytes."""
+
+    buffer = bytearray()
+    for piece in chunks:
+        buffer += piece
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def fetch(session, url, store, headers=None, timeout=None, check=None) -> ChunkStore:
+    """Downloads the stream at url into the store, resuming a previous
+    download of the same url and ETag.
+
+    @param session: the requests session sending the requests.
+    @param check: called between chunks, raises to stop the download.
+    @returns: the store, complete.
+    @raises StreamError: when the server answers with an error status, or
+        stops serving ranges.
+    """
+
+    headers = dict(headers or {})
+    if store.complete and store.manifest['url'] == url and store.verify():
+        return store
+
+    def get(first=None, last=None):
+        range_headers = dict(headers)
+        if first is not None:
+            if last is None:
+                last = first + CHUNK_SIZE - 1
+            range_headers['Range'] = 'bytes=%i-%i' % (first, last)
+        r = session.get(url, headers=range_headers, stream=True, timeout=timeout)
+        if r.status_code not in (200, 206):
+            r.close()
+            raise StreamError('Error downloading %s: %s' % (url, r.status_code))
+        return r
+
+    # The first chunk tells the size and whether ranges are supported; when
+    # resuming, only its first byte is asked for.
+    resuming = store.manifest['url'] == url and '0' in store.manifest['chunks']
+    r = get(0, 0 if resuming else None)
+    etag = r.headers.get('ETag', '')
+    content_type = r.headers.get('Content-Type', '')
+    if r.status_code == 206:
+        size = _content_range_size(r)
+        if (store.manifest['url'] != url or store.size != size
+                or store.manifest['etag'] != etag):
+            store.reset(url, size, etag, content_type)
+        if '0' not in store.manifest['chunks']:
+            if resuming:
+                r.close()
+                r = get(0)
+            store.write_chunk(0, r.content)
+        r.close()
+        for index in store.missing_chunks():
+            if check is not None:
+                check()
+            r = get(index * CHUNK_SIZE)
+            if r.status_code != 206:
+                r.close()
+                raise StreamError('%s stopped serving ranges' % url)
+            store.write_chunk(index, r.content)
+    else:
+        # No range support: stream the whole body, chunk by chunk.
+        size = r.headers.get('Content-Length')
+        store.reset(url, int(size) if size else None, etag, content_type)
+        written = 0
+        for index, data in enumerate(_read_exact(r.iter_content(1024 * 1024), CHUNK_SIZE)):
+            if check is not None:
+                check()
+            store.write_chunk(index, data)
+            written += len(data)
+        if store.size is None:
+            store.manifest['size'] = written
+            store.save_manifest()
+
+    store.finish()
+    log.info('Stream %s stored in %s (%s)', url, store.data_path, store.manifest['sha256'])
+    return store
@@ -2,6 +2,7 @@
 
 import functools
 import logging
+import threading
 import typing
 
 log = logging.getLogger(__name__)
@@ -10,11 +11,15 @@ log = logging.getLogger(__name__)
 LOCKI_ID_ENDPOINT = 'http://api.locki.io'  
 MVX_ENDPOINT = 'https://devnet-api.multiversx.com/'
 AUTH_ENDPOINT = 'https://9lz0kpwmfg.execute-api.eu-central-1.amazonaws.com'
+# Serves the datastreams behind the Data NFTs, overridden with DATASTREAM_ENDPOINT.
+DATASTREAM_ENDPOINT = 'https://api.itheumcloud-stg.com/datamarshalapi/router/v1/'
 
 
 # Will become a requests.Session at the first request to Locki ID.
 requests_session = None
 load_session = None
+# Jobs may ask for a session from several worker threads at once.
+_sessions_lock = threading.Lock()
 
 # Request timeout, in seconds.
 REQUESTS_TIMEOUT = 5.0
@@ -44,61 +49,64 @@ def load_nft_session():
 # Returns the loading session, creating it if necessary.
 # The load session is necessary because authorizing on some website returns error
     global load_session
-    import requests.adapters
+    import requests
+
+    from . import ratelimit
 
     if load_session is not None:
         return load_session
 
-    load_session = requests.session()
-
-    retries = requests.packages.urllib3.util.retry.Retry(
-        total=5,
-        backoff_factor=0.05,
-    )
-    http_adapter = requests.adapters.HTTPAdapter(max_retries=retries)
-    load_session.mount('https://', http_adapter)
-    load_session.mount('http://', http_adapter)
+    with _sessions_lock:
+        if load_session is not None:
+            return load_session
 
-    # Construct the User-Agent header with Blender and add-on versions.
-    try:
-        import bpy
-    except ImportError:
-        blender_version = 'unknown'
-    else:
-        blender_version = '.'.join(str(component)
-                                   for component in bpy.app.version)
+        session = requests.session()
 
-    from blender_id import bl_info
-    from . import bl_info as bl_info_addon 
-    # addon_version = '.'.join(str(component) for component in bl_info['version'])
-    addon_version = bl_info_addon['version']
-    load_session.headers['User-Agent'] = f'Blender/{blender_version} Locki-ID-Addon/{ addon_version }'
+        # Retries 429/503 after their Retry-After delay, and limits the request
+        # rate and concurrency per host.
+        http_adapter = ratelimit.http_adapter()
+        session.mount('https://', http_adapter)
+        session.mount('http://', http_adapter)
+        session.headers['User-Agent'] = user_agent()
 
+        load_session = session
     return load_session
 
 def locki_id_session(token: str = None):
     """Returns the Requests session, creating it if necessary."""
     global requests_session
-    import requests.adapters
+    import requests
+
+    from . import ratelimit
 
     if requests_session is not None:
         return requests_session
 
-    requests_session = requests.session()
+    with _sessions_lock:
+        if requests_session is not None:
+            return requests_session
 
-    #DEBUGGING
-    # no Host in header ???? print(requests_session.headers['Host'])
+        session = requests.session()
 
-    # Retry with backoff factor, so that a restart of Blender ID or hickup
-    # in the connection doesn't immediately fail the request.
-    retries = requests.packages.urllib3.util.retry.Retry(
-        total=5,
-        backoff_factor=0.05,
-    )
-    http_adapter = requests.adapters.HTTPAdapter(max_retries=retries)
-    requests_session.mount('https://', http_adapter)
-    requests_session.mount('http://', http_adapter)
+        #DEBUGGING
+        # no Host in header ???? print(requests_session.headers['Host'])
+
+        # Retry with backoff factor, so that a restart of Blender ID or hickup
+        # in the connection doesn't immediately fail the request. 429/503 are
+        # retried after their Retry-After delay, and the request rate and
+        # concurrency are limited per host.
+        http_adapter = ratelimit.http_adapter()
+        session.mount('https://', http_adapter)
+        session.mount('http://', http_adapter)
+        session.headers['User-Agent'] = user_agent()
+        if token is not None:
+            session.headers['Authorization'] = token
 
+        # Published once complete, for the threads not taking the lock.
+        requests_session = session
+    return requests_session
+
+def user_agent():
     # Construct the User-Agent header with Blender and add-on versions.
     try:
         import bpy
@@ -112,10 +120,7 @@ def locki_id_session(token: str = None):
     from . import bl_info as bl_info_addon 
     # addon_version = '.'.join(str(component) for component in bl_info['version'])
     addon_version = bl_info_addon['version']
-    requests_session.headers['User-Agent'] = f'Blender/{blender_version} Locki-ID-Addon/{ addon_version }'
-    if token is not None:
-        requests_session.headers['Authorization'] = token
-    return requests_session
+    return f'Blender/{blender_version} Locki-ID-Addon/{ addon_version }'
 
 @functools.lru_cache(maxsize=None)
 def auth_endpoint(endpoint_path=None):
@@ -156,6 +161,12 @@ def mvx_endpoint(endpoint_path=None):
 def mvx_authenticate(address, token) -> AuthResult:
     import requests.exceptions
 
+    from . import credentials
+
+    # No need to ask the server about an address with a bad checksum.
+    if not credentials.is_valid_address(address):
+        return AuthResult(success=False, error_message='address is incorrect')
+
     # Payload is optional (GET) 
     payload = dict(
         address=address,
@@ -189,6 +200,26 @@ def mvx_authenticate(address, token) -> AuthResult:
                                     ' the server. Error code is: %s' % r.status_code)
 
 
+@functools.lru_cache(maxsize=None)
+def datastream_endpoint(endpoint_path=None):
+    """Gets the endpoint of the Data NFT datastreams. If the DATASTREAM_ENDPOINT env
+    variable is defined, it's possible to override the (default) address, e.g. with
+    a local server for testing.
+    """
+    import os
+    import urllib.parse
+
+    base_url = os.environ.get('DATASTREAM_ENDPOINT')
+    if base_url:
+        log.warning('Using overridden datastream url %s', base_url)
+    else:
+        base_url = DATASTREAM_ENDPOINT
+        log.info('Using standard datastream url %s', base_url)
+
+    # urljoin() is None-safe for the 2nd parameter.
+    return urllib.parse.urljoin(base_url, endpoint_path)
+
+
 @functools.lru_cache(maxsize=None)
 def locki_id_endpoint(endpoint_path=None):
     """Gets the endpoint for the authentication API. If the LOCKI_ID_ENDPOINT env variable
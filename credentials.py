@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Local checks of the credentials before asking a server: bech32 erd1
+# addresses and NativeAuth tokens, whose address, origin, time to live and
+# extra info are base64url segments of the token.
+
+import base64
+import collections
+import datetime
+import functools
+import json
+
+ADDRESS_HRP = 'erd'
+
+_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+_GENERATOR = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+
+NativeAuthToken = collections.namedtuple(
+    'NativeAuthToken', 'address origin block_hash ttl extra_info signature expires')
+
+
+def _polymod(values):
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for i, generator in enumerate(_GENERATOR):
+            if (top >> i) & 1:
+                checksum ^= generator
+    return checksum
+
+
+def _hrp_expand(hrp):
+    return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
+
+
+def _convert_bits(data, from_bits, to_bits):
+    """Regroups the bits of the bech32 5-bit words into bytes, or None when
+    the padding is invalid."""
+
+    acc = bits = 0
+    result = []
+    max_value = (1 << to_bits) - 1
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((acc >> bits) & max_value)
+    if bits >= from_bits or (acc << (to_bits - bits)) & max_value:
+        return None
+    return result
+
+
+def bech32_decode(text):
+    """Returns (hrp, data bytes) of a bech32 string, or None when it is not
+    valid bech32 (characters, case, length or checksum)."""
+
+    if not text or text.lower() != text and text.upper() != text:
+        return None
+    text = text.lower()
+    separator = text.rfind('1')
+    if separator < 1 or separator + 7 > len(text) or len(text) > 90:
+        return None
+    hrp = text[:separator]
+    try:
+        words = [_CHARSET.index(c) for c in text[separator + 1:]]
+    except ValueError:
+        return None
+    if _polymod(_hrp_expand(hrp) + words) != 1:
+        return None
+    data = _convert_bits(words[:-6], 5, 8)
+    if data is None:
+        return None
+    return hrp, bytes(data)
+
+
+@functools.lru_cache(maxsize=64)
+def is_valid_address(address) -> bool:
+    """Whether address is an erd1 address with a valid bech32 checksum."""
+
+    decoded = bech32_decode(address)
+    return decoded is not None and decoded[0] == ADDRESS_HRP and len(decoded[1]) == 32
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4)).decode('utf8')
+
+
+@functools.lru_cache(maxsize=16)
+def decode_native_auth(token) -> NativeAuthToken:
+    """Decodes a NativeAuth token without any network call.
+
+    expires is only known when the extra info carries a timestamp, the
+    other tokens expire ttl seconds after a block only the server knows.
+
+    @raises ValueError: when the token is malformed or its address invalid.
+    """
+    token = token.strip()
+    if token.lower().startswith('bearer '):
+        token = token[7:].strip()
+    try:
+        address_segment, body_segment, signature = token.split('.')
+        address = _b64decode(address_segment)
+        origin_segment, block_hash, ttl, *extra = _b64decode(body_segment).split('.')
+        origin = _b64decode(origin_segment)
+        ttl = int(ttl)
+        extra_info = json.loads(_b64decode(extra[0])) if extra and extra[0] else {}
+    except (ValueError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError('Malformed NativeAuth token: %s' % e) from None
+
+    if not is_valid_address(address):
+        raise ValueError('The NativeAuth token is not for a valid erd1 address')
+
+    expires = None
+    timestamp = extra_info.get('timestamp') if isinstance(extra_info, dict) else None
+    if isinstance(timestamp, (int, float)):
+        expires = datetime.datetime.utcfromtimestamp(timestamp + ttl)
+    return NativeAuthToken(address, origin, block_hash, ttl, extra_info, signature, expires)
+
+
+def preflight(address, token):
+    """Checks the address and the token locally.
+
+    @returns: an error message, or None when the server has to be asked.
+    """
+    if address and not is_valid_address(address):
+        return 'The address is not a valid erd1 address'
+    try:
+        decoded = decode_native_auth(token)
+    except ValueError as e:
+        return str(e)
+    if address and decoded.address != address:
+        return 'The NativeAuth token was issued for another address'
+    if decoded.expires is not None and decoded.expires <= datetime.datetime.utcnow():
+        return 'The NativeAuth token has expired'
+    return None
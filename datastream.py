@@ -0,0 +1,154 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Downloads the datastream behind a Data NFT into a local chunk store, see
+# chunkstore.py, and imports CSV streams as point clouds.
+
+import itertools
+import os
+import urllib.parse
+
+import bpy
+
+from . import chunkstore
+from . import communication
+from . import filelock
+# Seconds to wait for another instance downloading the same stream.
+LOCK_TIMEOUT = 300.0
+# Lines parsed at once by the CSV point cloud import.
+CSV_BLOCK_LINES = 100000
+
+# Set/created upon register.
+streams_path = ''
+
+
+def register():
+    global streams_path
+
+    streams_path = bpy.utils.user_resource(
+        'CONFIG', path=os.path.join('locki_id', 'streams'), create=True)
+
+
+def stream_url(identifier):
+    """Returns the url of the datastream of the Data NFT with the given identifier."""
+
+    return communication.datastream_endpoint(
+        'access?' + urllib.parse.urlencode({'NFTId': identifier}))
+
+
+def fetch(url, key=None, headers=None) -> chunkstore.ChunkStore:
+    """Downloads the stream at url into the chunk store of key (the url by
+    default), resuming a previous download. Runs in a job: it checks the
+    cancellation token between chunks.
+
+    @raises communication.LockiIdCommError: when the download fails, or
+        another instance is still downloading it after LOCK_TIMEOUT seconds.
+    """
+    import requests.exceptions
+
+    from . import jobs
+
+    # One instance at a time writes a store; the others wait and reuse it.
+    try:
+        with filelock.locked(chunkstore.ChunkStore(streams_path, key or url).data_path,
+                             timeout=LOCK_TIMEOUT):
+            # read once locked, the manifest may come from another instance
+            store = chunkstore.ChunkStore(streams_path, key or url)
+            return chunkstore.fetch(communication.load_nft_session(), url, store, headers,
+                                    timeout=communication.REQUESTS_TIMEOUT,
+                                    check=jobs.current_token().check)
+    except filelock.LockTimeout:
+        raise communication.LockiIdCommError(
+            'Another Blender instance is still downloading %s' % url)
+    except (chunkstore.StreamError,
+            requests.exceptions.HTTPError,
+            requests.exceptions.ConnectionError) as e:
+        raise communication.LockiIdCommError(str(e))
+
+
+def read_csv_points(store):
+    """Reads the first three numeric columns of a CSV stream through the
+    memory map, a block of lines at a time. Returns a (n, 3) float32 array.
+    """
+    import io
+
+    import numpy as np
+
+    blocks = []
+    with store.open() as data:
+        if not data:
+            return np.empty((0, 3), dtype=np.float32)
+        lines = iter(data.readline, b'')
+        first = next(lines)
+        try:
+            [float(value) for value in first.split(b',')[:3]]
+        except ValueError:
+            pass  # skip the header
+        else:
+            lines = itertools.chain([first], lines)
+        while True:
+            block = [line for _, line in zip(range(CSV_BLOCK_LINES), lines) if line.strip()]
+            if not block:
+                break
+            blocks.append(np.loadtxt(io.BytesIO(b''.join(block)), delimiter=',',
+                                     usecols=(0, 1, 2), dtype=np.float32, ndmin=2))
+    if not blocks:
+        return np.empty((0, 3), dtype=np.float32)
+    return np.concatenate(blocks)
+
+
+def import_csv_points(store, name):
+    """Creates a point cloud object with a vertex per row of the CSV stream."""
+
+    points = read_csv_points(store)
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(points))
+    mesh.vertices.foreach_set('co', points.ravel())
+    mesh.update()
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+def is_csv(store):
+    return ('csv' in store.manifest['content_type']
+            or store.manifest['url'].split('?')[0].lower().endswith('.csv'))
+
+
+class UTILS_OT_fetch_datastream(bpy.types.Operator):
+    """Download the datastream of the Data NFT into the local stream store"""
+
+    bl_idname = "utils.fetch_datastream"
+    bl_label = "Fetch the datastream"
+    bl_options = {"REGISTER"}
+
+    identifier: bpy.props.StringProperty(
+        name="Identifier",
+        description="Identifier of the Data NFT",
+    ) # type: ignore
+
+    def execute(self, context):
+        from . import jobs, mvx_requests, profiles
+
+        if not self.identifier:
+            self.report({'ERROR'}, 'No Data NFT selected')
+            return {'CANCELLED'}
+
+        if not profiles.LockiIdProfile.token:
+            self.report({'ERROR'}, 'Log in to access the datastream')
+            return {'CANCELLED'}
+
+        identifier = self.identifier
+        headers = {'Authorization': 'Bearer %s' % profiles.LockiIdProfile.token}
+
+        def on_done(job):
+            if not job.succeeded:
+                mvx_requests.show_message(identifier, job.error)
+                return
+            store = job.result
+            if is_csv(store):
+                import_csv_points(store, identifier)
+            else:
+                print(f"Datastream of {identifier} stored in {store.data_path}")
+
+        jobs.submit(fetch, stream_url(identifier), identifier, headers,
+                    name='datastream %s' % identifier, on_done=on_done)
+        return {"FINISHED"}
@@ -0,0 +1,297 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Merges identical meshes, materials and images that were imported from
+# different NFTs into one datablock.
+
+import hashlib
+import logging
+
+import bpy
+import numpy as np
+
+from . import batch_mode
+
+log = logging.getLogger(__name__)
+
+
+class DedupResult:
+    def __init__(self):
+        self.removed = {'images': 0, 'materials': 0, 'meshes': 0}
+        self.bytes_saved = 0
+
+    def __str__(self):
+        return '%d images, %d materials, %d meshes merged (%.1f MiB saved)' % (
+            self.removed['images'], self.removed['materials'], self.removed['meshes'],
+            self.bytes_saved / (1024 * 1024))
+
+
+def _array(collection, attr, dtype, width=1):
+    arr = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attr, arr)
+    return arr
+
+
+def image_signature(image):
+    if image.type != 'IMAGE' or not image.size[0]:
+        return None  # Render results, viewer nodes and missing files.
+    return tuple(image.size), image.channels, image.is_float
+
+
+def image_hash(image):
+    """Hashes the pixels of the image; returns (digest, size in bytes)."""
+
+    pixels = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    digest = hashlib.sha256(pixels.tobytes()).hexdigest()
+    byte_size = pixels.size * (4 if image.is_float else 1)
+    return digest, byte_size
+
+
+def mesh_signature(mesh):
+    return len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons)
+
+
+# Property holding the values of an attribute of each data type, and its width.
+_ATTRIBUTE_VALUES = {
+    'FLOAT': ('value', np.float32, 1),
+    'INT': ('value', np.int32, 1),
+    'INT8': ('value', np.int8, 1),
+    'BOOLEAN': ('value', np.bool_, 1),
+    'FLOAT2': ('vector', np.float32, 2),
+    'INT32_2D': ('value', np.int32, 2),
+    'FLOAT_VECTOR': ('vector', np.float32, 3),
+    'FLOAT_COLOR': ('color', np.float32, 4),
+    'BYTE_COLOR': ('color', np.float32, 4),
+    'QUATERNION': ('value', np.float32, 4),
+}
+
+
+def _attribute_buffer(attribute):
+    if attribute.data_type not in _ATTRIBUTE_VALUES:  # STRING, and types added later
+        return repr([getattr(item, 'value', None) for item in attribute.data]).encode()
+    prop, dtype, width = _ATTRIBUTE_VALUES[attribute.data_type]
+    return _array(attribute.data, prop, dtype, width)
+
+
+def mesh_hash(mesh):
+    """Hashes everything a mesh stores: the geometry, every attribute (UV maps
+    and color attributes included), custom normals, edge flags, deform
+    weights, shape keys and materials. Returns (digest, size in bytes)."""
+
+    buffers = [
+        _array(mesh.vertices, 'co', np.float32, 3),
+        _array(mesh.edges, 'vertices', np.int32, 2),
+        _array(mesh.edges, 'use_seam', np.bool_),
+        _array(mesh.edges, 'use_edge_sharp', np.bool_),
+        _array(mesh.loops, 'vertex_index', np.int32),
+        _array(mesh.polygons, 'loop_total', np.int32),
+        _array(mesh.polygons, 'use_smooth', np.bool_),
+    ]
+    h = hashlib.sha256()
+
+    # Selection is UI state, not data worth keeping two meshes for.
+    for attribute in sorted(mesh.attributes, key=lambda a: a.name):
+        if attribute.name.startswith('.select'):
+            continue
+        h.update(repr((attribute.name, attribute.domain, attribute.data_type)).encode())
+        buffers.append(_attribute_buffer(attribute))
+
+    for uv_layer in mesh.uv_layers:
+        h.update(uv_layer.name.encode())
+        buffers.append(_array(uv_layer.data, 'uv', np.float32, 2))
+
+    if mesh.has_custom_normals:
+        if bpy.app.version >= (4, 1, 0):
+            buffers.append(_array(mesh.corner_normals, 'vector', np.float32, 3))
+        else:
+            mesh.calc_normals_split()
+            buffers.append(_array(mesh.loops, 'normal', np.float32, 3))
+
+    # Deform weights are not attributes; their group names live on the objects.
+    group_names = sorted({tuple(group.name for group in obj.vertex_groups)
+                          for obj in bpy.data.objects if obj.data == mesh})
+    if any(group_names):
+        h.update(repr(group_names).encode())
+        weights = [(vertex.index, group.group, group.weight)
+                   for vertex in mesh.vertices for group in vertex.groups]
+        buffers.append(np.array(weights, dtype=np.float64))
+
+    if mesh.shape_keys is not None:
+        h.update(repr((mesh.shape_keys.use_relative,
+                       mesh.shape_keys.reference_key.name)).encode())
+        for key_block in mesh.shape_keys.key_blocks:
+            h.update(repr((key_block.name, key_block.relative_key.name, key_block.value,
+                           key_block.slider_min, key_block.slider_max,
+                           key_block.interpolation, key_block.vertex_group,
+                           key_block.mute)).encode())
+            buffers.append(_array(key_block.data, 'co', np.float32, 3))
+
+    for buf in buffers:
+        h.update(buf if isinstance(buf, bytes) else buf.tobytes())
+    for mat in mesh.materials:
+        h.update((mat.name if mat else '').encode())
+    return h.hexdigest(), sum(len(buf) if isinstance(buf, bytes) else buf.nbytes
+                              for buf in buffers)
+
+
+def _socket_value(socket):
+    value = getattr(socket, 'default_value', None)
+    if value is None:
+        return None
+    try:
+        return tuple(value)
+    except TypeError:
+        return value
+
+
+def material_signature(material):
+    if not material.use_nodes or material.node_tree is None:
+        return False, 0, 0
+    return True, len(material.node_tree.nodes), len(material.node_tree.links)
+
+
+def material_hash(material):
+    """Hashes the node tree of the material; returns (digest, size in bytes).
+
+    Images are referenced by name, so images should be merged first.
+    """
+
+    parts = [tuple(material.diffuse_color), material.blend_method]
+    if material.use_nodes and material.node_tree is not None:
+        for node in sorted(material.node_tree.nodes, key=lambda n: n.name):
+            image = getattr(node, 'image', None)
+            group = getattr(node, 'node_tree', None)
+            parts.append((node.bl_idname, node.name,
+                          image.name if image else None,
+                          group.name if group else None,
+                          tuple(_socket_value(s) for s in node.inputs)))
+        for link in material.node_tree.links:
+            parts.append((link.from_node.name, link.from_socket.identifier,
+                          link.to_node.name, link.to_socket.identifier))
+    return hashlib.sha256(repr(parts).encode()).hexdigest(), 0
+
+
+def dedup_datablocks(datablocks, signature, content_hash, removable=None):
+    """Remaps every duplicate in datablocks onto one canonical datablock and
+    removes the duplicates.
+
+    Only datablocks with the same cheap signature are hashed.
+
+    @param removable: when given, only these datablocks may be merged into
+        the others; the rest are only kept as canonical datablocks.
+    @returns: tuple (number removed, bytes saved)
+    """
+
+    by_signature = {}
+    for datablock in datablocks:
+        if datablock.library is not None:
+            continue
+        key = signature(datablock)
+        if key is None:
+            continue
+        by_signature.setdefault(key, []).append(datablock)
+
+    duplicates = []
+    bytes_saved = 0
+    for candidates in by_signature.values():
+        if len(candidates) < 2:
+            continue
+        if removable is not None:
+            if not any(d in removable for d in candidates):
+                continue
+            # The datablocks kept come first, to be the canonical ones.
+            candidates.sort(key=lambda d: (d in removable, d.name))
+        else:
+            candidates.sort(key=lambda d: d.name)
+
+        canonical = {}
+        for datablock in candidates:
+            digest, byte_size = content_hash(datablock)
+            if digest not in canonical:
+                canonical[digest] = datablock
+                continue
+            if removable is not None and datablock not in removable:
+                continue
+            datablock.user_remap(canonical[digest])
+            duplicates.append(datablock)
+            bytes_saved += byte_size
+
+    if duplicates:
+        bpy.data.batch_remove(duplicates)
+    return len(duplicates), bytes_saved
+
+
+def dedup_all():
+    """Runs the dedup pass over the images, materials and meshes of the file."""
+
+    result = DedupResult()
+    # Images first, as materials are compared by the names of their images.
+    # Same for materials, which meshes refer to by name.
+    passes = (
+        ('images', bpy.data.images, image_signature, image_hash),
+        ('materials', bpy.data.materials, material_signature, material_hash),
+        ('meshes', bpy.data.meshes, mesh_signature, mesh_hash),
+    )
+    for key, datablocks, signature, content_hash in passes:
+        removed, bytes_saved = dedup_datablocks(list(datablocks), signature, content_hash)
+        result.removed[key] = removed
+        result.bytes_saved += bytes_saved
+
+    log.info('Dedup: %s', result)
+    return result
+
+
+def _nft_data(objects):
+    """Returns the images, materials and meshes used by the objects."""
+
+    meshes = {obj.data for obj in objects if obj.type == 'MESH'}
+    materials = {slot.material for obj in objects for slot in obj.material_slots
+                 if slot.material is not None}
+    materials.update(mat for mesh in meshes for mat in mesh.materials if mat is not None)
+    images = {node.image for mat in materials if mat.use_nodes and mat.node_tree
+              for node in mat.node_tree.nodes if getattr(node, 'image', None) is not None}
+    return {'images': images, 'materials': materials, 'meshes': meshes}
+
+
+def dedup_imported(objects):
+    """Merges the images, materials and meshes of freshly imported NFT
+    objects into identical ones of earlier NFT imports. The other data of
+    the file, e.g. the artist's own, is left alone.
+    """
+    from . import instancing
+
+    objects = set(objects)
+    new = _nft_data(objects)
+    earlier = _nft_data([obj for obj in bpy.data.objects
+                         if instancing.NFT_ID_PROP in obj and obj not in objects])
+
+    result = DedupResult()
+    passes = (
+        ('images', image_signature, image_hash),
+        ('materials', material_signature, material_hash),
+        ('meshes', mesh_signature, mesh_hash),
+    )
+    for key, signature, content_hash in passes:
+        removable = new[key] - earlier[key]
+        if not removable:
+            continue
+        removed, bytes_saved = dedup_datablocks(list(removable | earlier[key]), signature,
+                                                content_hash, removable)
+        result.removed[key] = removed
+        result.bytes_saved += bytes_saved
+
+    log.info('Dedup of the imported NFT: %s', result)
+    return result
+
+
+@batch_mode.heavy_operator
+class UTILS_OT_dedup_data(bpy.types.Operator):
+    """Merge identical meshes, materials and images into one datablock"""
+
+    bl_idname = "utils.dedup_data"
+    bl_label = "Merge duplicate data"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        result = dedup_all()
+        self.report({'INFO'}, str(result))
+        return {"FINISHED"}
@@ -0,0 +1,121 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Advisory file locks and atomic writes, for the files shared by several
+# Blender instances: profiles.json and the download cache.
+
+import contextlib
+import os
+import tempfile
+import threading
+import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Seconds between two attempts to take a lock held by another instance.
+RETRY_INTERVAL = 0.1
+
+# Locks taken by this process, so threads of one Blender serialize as well:
+# flock() does not exclude other threads of the same process on every
+# platform. These are plain locks: a thread must not nest locked() on the
+# same path, which would deadlock on flock() anyway.
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+class LockTimeout(OSError):
+    """Raised when a lock could not be taken within the timeout."""
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.Lock()
+        return lock
+
+
+def _try_lock(fd, shared):
+    """Takes the file lock without waiting; returns whether it was taken."""
+
+    try:
+        if os.name == 'nt':
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def locked(path, shared=False, timeout=None):
+    """Holds an advisory lock on path + '.lock' for the duration of the block.
+
+    Shared locks let several readers in at once; on Windows every lock is
+    exclusive. Not reentrant.
+
+    @param timeout: seconds to wait for the lock, None to wait as long as it
+        takes.
+    @raises LockTimeout: when the lock is still held by others after timeout.
+    """
+    lock_path = path + '.lock'
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    thread_lock = _thread_lock(lock_path)
+    if not thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise LockTimeout('Timed out waiting for %s' % lock_path)
+    try:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if timeout is None and os.name != 'nt':
+                fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                # msvcrt.locking(LK_LOCK) gives up after 10 seconds, so
+                # Windows always polls.
+                while not _try_lock(fd, shared):
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise LockTimeout('Timed out waiting for %s' % lock_path)
+                    time.sleep(RETRY_INTERVAL)
+            try:
+                yield
+            finally:
+                if os.name == 'nt':
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+    finally:
+        thread_lock.release()
+
+
+def atomic_write(path, data, mode=0o600):
+    """Writes data (bytes or str) to path through a temporary file, so
+    readers never see a partly written file."""
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode('utf8') if isinstance(data, str) else data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def signature(path):
+    """Returns what changes when another process rewrites the file, or None
+    when it does not exist."""
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
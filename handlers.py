@@ -0,0 +1,209 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Registry of the frame change handlers installed by the add-on and by NFT
+# scripts. Handlers are registered once per name and wrapped with timing,
+# and the playback performance is shown in a panel of the Locki sidebar.
+
+import collections
+import functools
+import time
+
+import bpy
+
+# Number of frames the averages are computed over.
+WINDOW = 60
+# Seconds between two redraws of the panel during playback.
+REDRAW_INTERVAL = 0.5
+
+FRAME_EVENTS = ('frame_change_pre', 'frame_change_post')
+
+_handler_times = {}  # handler name -> deque of seconds per call
+_frame_intervals = collections.deque(maxlen=WINDOW)
+_eval_times = collections.deque(maxlen=WINDOW)
+_last_pre = None
+_last_post = None
+_last_redraw = 0.0
+
+
+def handler_name(func):
+    return '%s.%s' % (func.__module__, getattr(func, '__qualname__', repr(func)))
+
+
+def _wrap(name, func):
+    @functools.wraps(func)
+    def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            times = _handler_times.get(name)
+            if times is None:
+                times = _handler_times[name] = collections.deque(maxlen=WINDOW)
+            times.append(time.perf_counter() - start)
+
+    wrapper._locki_handler = name
+    return wrapper
+
+
+def _is_profiler(handler):
+    return handler in (_profile_pre, _profile_post)
+
+
+def register_handler(event, func, name=None):
+    """Appends func to bpy.app.handlers.<event>, wrapped with timing.
+
+    A handler registered earlier under the same name is replaced, so
+    registering the same function again does not run it twice.
+    """
+
+    name = name or handler_name(func)
+    handler_list = getattr(bpy.app.handlers, event)
+    for handler in list(handler_list):
+        if handler is func or getattr(handler, '_locki_handler', None) == name:
+            handler_list.remove(handler)
+    handler_list.append(_wrap(name, func))
+    _place_profilers()
+
+
+def unregister_handler(event, func_or_name):
+    name = func_or_name if isinstance(func_or_name, str) else handler_name(func_or_name)
+    handler_list = getattr(bpy.app.handlers, event)
+    for handler in list(handler_list):
+        if handler is func_or_name or getattr(handler, '_locki_handler', None) == name:
+            handler_list.remove(handler)
+    _handler_times.pop(name, None)
+
+
+def adopt_handlers(events=FRAME_EVENTS):
+    """Wraps the handlers other code (such as NFT scripts) appended directly
+    to the frame change handler lists. When a function was appended several
+    times, e.g. by loading the same script again, only the last one is kept.
+    """
+
+    for event in events:
+        handler_list = getattr(bpy.app.handlers, event)
+        seen = set()
+        # Newest handlers are at the end.
+        for index in reversed(range(len(handler_list))):
+            handler = handler_list[index]
+            if _is_profiler(handler):
+                continue
+            name = getattr(handler, '_locki_handler', None) or handler_name(handler)
+            if name in seen:
+                del handler_list[index]
+                continue
+            seen.add(name)
+            if not hasattr(handler, '_locki_handler'):
+                handler_list[index] = _wrap(name, handler)
+    _place_profilers()
+
+
+@bpy.app.handlers.persistent
+def _profile_pre(*args):
+    global _last_pre
+    _last_pre = time.perf_counter()
+
+
+@bpy.app.handlers.persistent
+def _profile_post(*args):
+    global _last_post, _last_redraw
+
+    now = time.perf_counter()
+    if _last_pre is not None:
+        # Between the last frame_change_pre and the first frame_change_post
+        # handler, Blender evaluates the depsgraph.
+        _eval_times.append(now - _last_pre)
+    if _last_post is not None:
+        _frame_intervals.append(now - _last_post)
+    _last_post = now
+
+    if now - _last_redraw > REDRAW_INTERVAL:
+        _last_redraw = now
+        screen = getattr(bpy.context, 'screen', None)
+        if screen is not None:
+            for area in screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+
+
+def _place_profilers():
+    """Keeps the profiler last of frame_change_pre and first of frame_change_post."""
+
+    pre = bpy.app.handlers.frame_change_pre
+    post = bpy.app.handlers.frame_change_post
+    if _profile_pre in pre:
+        pre.remove(_profile_pre)
+    pre.append(_profile_pre)
+    if _profile_post in post:
+        post.remove(_profile_post)
+    post.insert(0, _profile_post)
+
+
+def _average(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def stats():
+    """Returns (fps, depsgraph ms, [(handler name, ms per frame)]) over the last frames."""
+
+    interval = _average(_frame_intervals)
+    fps = 1.0 / interval if interval else 0.0
+    handler_ms = sorted(((name, _average(times) * 1000) for name, times in _handler_times.items()),
+                        key=lambda item: -item[1])
+    return fps, _average(_eval_times) * 1000, handler_ms
+
+
+def reset_stats():
+    global _last_pre, _last_post
+
+    _handler_times.clear()
+    _frame_intervals.clear()
+    _eval_times.clear()
+    _last_pre = _last_post = None
+
+
+class VIEW3D_PT_locki_performance(bpy.types.Panel):
+    bl_idname = "VIEW3D_PT_locki_performance"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "Locki.io"
+    bl_label = "Playback Performance"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        fps, eval_ms, handler_ms = stats()
+        scene = context.scene
+        target_fps = scene.render.fps / scene.render.fps_base
+
+        col = layout.column(align=True)
+        col.alert = bool(fps) and fps < target_fps * 0.9
+        col.label(text='FPS: %.1f / %.1f' % (fps, target_fps), icon='PLAY')
+        col = layout.column(align=True)
+        col.label(text='Depsgraph: %.2f ms' % eval_ms, icon='NODETREE')
+        for name, ms in handler_ms:
+            col.label(text='%s: %.2f ms' % (name.rsplit('.', 1)[-1], ms), icon='SCRIPT')
+        layout.operator("utils.reset_handler_stats", text="Reset", icon='FILE_REFRESH')
+
+
+class UTILS_OT_reset_handler_stats(bpy.types.Operator):
+    """Forget the measured playback timings"""
+
+    bl_idname = "utils.reset_handler_stats"
+    bl_label = "Reset playback statistics"
+
+    def execute(self, context):
+        reset_stats()
+        return {"FINISHED"}
+
+
+def register():
+    _place_profilers()
+
+
+def unregister():
+    for event in FRAME_EVENTS:
+        handler_list = getattr(bpy.app.handlers, event)
+        for handler in list(handler_list):
+            if _is_profiler(handler) or hasattr(handler, '_locki_handler'):
+                handler_list.remove(handler)
+    reset_stats()
@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Reuse of NFTs that were already imported into the blend file.
+
+import bpy
+from mathutils import Vector
+
+# Custom properties set on the collections and objects created by an NFT import.
+NFT_ID_PROP = 'locki_nft_id'
+NFT_URL_PROP = 'locki_nft_url'
+NFT_HASH_PROP = 'locki_nft_hash'
+
+
+def find_nft_collection(url=None, digest=None):
+    """Returns the collection holding an earlier import of the NFT file, matched
+    by url or by content hash. Returns None when it is not in the file.
+    """
+
+    for col in bpy.data.collections:
+        if url and col.get(NFT_URL_PROP) == url:
+            return col
+        if digest and col.get(NFT_HASH_PROP) == digest:
+            return col
+    return None
+
+
+def _copy_tags(source, target):
+    for prop in (NFT_ID_PROP, NFT_URL_PROP, NFT_HASH_PROP):
+        target[prop] = source[prop]
+
+
+def tag_imported(objects, nft_id, url, digest):
+    """Moves freshly imported objects into their own collection and tags
+    them, so that later loads of the same NFT can reuse their data.
+    """
+
+    col = bpy.data.collections.new(nft_id)
+    col[NFT_ID_PROP] = nft_id
+    col[NFT_URL_PROP] = url
+    col[NFT_HASH_PROP] = digest
+    bpy.context.scene.collection.children.link(col)
+
+    for obj in objects:
+        _copy_tags(col, obj)
+        for users_col in obj.users_collection:
+            users_col.objects.unlink(obj)
+        col.objects.link(obj)
+
+    return col
+
+
+def instance_collection(col, location=(0, 0, 0)):
+    """Adds an empty instancing the whole NFT collection."""
+
+    empty = bpy.data.objects.new(col.name, None)
+    empty.instance_type = 'COLLECTION'
+    empty.instance_collection = col
+    empty.location = location
+    _copy_tags(col, empty)
+    bpy.context.scene.collection.objects.link(empty)
+    return empty
+
+
+def linked_duplicate(col, location=(0, 0, 0)):
+    """Copies the objects of the NFT collection into a new collection,
+    sharing their mesh, material and image data (like Alt+D).
+    """
+
+    new_col = bpy.data.collections.new(col.name)
+    _copy_tags(col, new_col)
+    bpy.context.scene.collection.children.link(new_col)
+
+    copies = {}
+    for obj in col.all_objects:
+        copy = obj.copy()  # obj.data is shared, not copied
+        _copy_tags(col, copy)
+        new_col.objects.link(copy)
+        copies[obj] = copy
+
+    for obj, copy in copies.items():
+        if obj.parent in copies:
+            copy.parent = copies[obj.parent]
+        else:
+            copy.location = obj.location + Vector(location)
+
+    return new_col
+
+
+def reuse_nft(col, mode, location=(0, 0, 0)):
+    """Places another copy of an already imported NFT in the scene."""
+
+    if mode == 'LINKED':
+        return linked_duplicate(col, location)
+    return instance_collection(col, location)
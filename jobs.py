@@ -0,0 +1,235 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Job scheduler for the networked operations of the add-on.
+#
+# Jobs run on a pool of worker threads, highest priority first, and may
+# depend on other jobs. They must not touch bpy: their on_done callback is
+# called on the main thread, from a bpy.app.timers callback draining the
+# completion queue, and that is where the result goes into Blender.
+
+import heapq
+import itertools
+import logging
+import queue
+import threading
+
+import bpy
+
+log = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+# The per-host concurrency is limited further by ratelimit.
+MAX_WORKERS = 8
+
+# Seconds between two drains of the completion queue while jobs are alive.
+POLL_INTERVAL = 0.05
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by CancelToken.check() once the job is cancelled."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """Raises JobCancelled when the job was cancelled; long jobs call
+        this between steps."""
+
+        if self._event.is_set():
+            raise JobCancelled()
+
+
+class Job:
+    def __init__(self, func, args, kwargs, *, name, priority, depends_on, on_done):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name
+        self.priority = priority
+        self.depends_on = tuple(depends_on)
+        self.on_done = on_done
+        self.token = CancelToken()
+        self.state = 'PENDING'
+        self.result = None
+        self.error = None
+
+    def __repr__(self):
+        return '<Job %s %s>' % (self.name, self.state)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in {'DONE', 'FAILED', 'CANCELLED'}
+
+    @property
+    def succeeded(self) -> bool:
+        return self.state == 'DONE'
+
+    def cancel(self):
+        """Cancels the job. A running job stops at its next token check."""
+
+        self.token.cancel()
+
+
+_condition = threading.Condition()
+_ready = []  # heap of (priority, sequence, job)
+_waiting = []  # jobs whose dependencies are not finished yet
+_sequence = itertools.count()
+_workers = []
+_alive = set()  # jobs submitted and not yet handed to on_done
+_completed = queue.SimpleQueue()
+_shutting_down = False
+_local = threading.local()
+
+
+def current_token() -> CancelToken:
+    """Returns the cancellation token of the job running in this thread."""
+
+    return getattr(_local, 'token', None) or CancelToken()
+
+
+def submit(func, *args, name=None, priority=PRIORITY_NORMAL, depends_on=(), on_done=None,
+           **kwargs) -> Job:
+    """Schedules func(*args, **kwargs) on the worker threads.
+
+    @param depends_on: jobs that must have succeeded before this one starts.
+        When one of them fails or is cancelled, this job is cancelled.
+    @param on_done: called as on_done(job) on the main thread once the job
+        is finished, with job.result or job.error set.
+    @returns: the Job, which can be cancelled.
+    """
+
+    global _shutting_down
+
+    job = Job(func, args, kwargs, name=name or getattr(func, '__name__', 'job'),
+              priority=priority, depends_on=depends_on, on_done=on_done)
+    with _condition:
+        _shutting_down = False
+        _alive.add(job)
+        _waiting.append(job)
+        _release_waiting()
+        if len(_workers) < MAX_WORKERS and len(_workers) < len(_alive):
+            worker = threading.Thread(target=_worker, name='locki-job-%d' % len(_workers),
+                                      daemon=True)
+            _workers.append(worker)
+            worker.start()
+        _condition.notify()
+
+    if not bpy.app.timers.is_registered(_drain):
+        bpy.app.timers.register(_drain, first_interval=POLL_INTERVAL)
+    return job
+
+
+def _release_waiting():
+    """Moves the jobs whose dependencies are finished to the ready heap.
+    Must be called with _condition held."""
+
+    for job in list(_waiting):
+        if not all(dep.finished for dep in job.depends_on):
+            continue
+        _waiting.remove(job)
+        failed = [dep for dep in job.depends_on if not dep.succeeded]
+        if failed:
+            job.state = 'CANCELLED'
+            job.error = 'Dependency %s did not succeed' % failed[0].name
+            _completed.put(job)
+        else:
+            heapq.heappush(_ready, (job.priority, next(_sequence), job))
+
+
+def _worker():
+    while True:
+        with _condition:
+            while not _ready and not _shutting_down:
+                _condition.wait()
+            if _shutting_down:
+                _workers.remove(threading.current_thread())
+                return
+            _, _, job = heapq.heappop(_ready)
+            job.state = 'RUNNING'
+
+        _run(job)
+
+        with _condition:
+            _release_waiting()
+            _condition.notify_all()
+        _completed.put(job)
+
+
+def _run(job):
+    if job.token.cancelled:
+        job.state = 'CANCELLED'
+        return
+
+    _local.token = job.token
+    try:
+        job.result = job.func(*job.args, **job.kwargs)
+    except JobCancelled:
+        job.state = 'CANCELLED'
+    except Exception as e:
+        log.exception('Error in job %s', job.name)
+        job.error = str(e) or type(e).__name__
+        job.state = 'FAILED'
+    else:
+        job.state = 'CANCELLED' if job.token.cancelled else 'DONE'
+    finally:
+        _local.token = None
+
+
+def _drain():
+    while True:
+        try:
+            job = _completed.get_nowait()
+        except queue.Empty:
+            break
+        _alive.discard(job)
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception:
+                log.exception('Error finishing job %s', job.name)
+        _tag_redraw()
+
+    return POLL_INTERVAL if _alive else None
+
+
+def _tag_redraw():
+    window_manager = bpy.context.window_manager
+    if window_manager is None:
+        return
+    for window in window_manager.windows:
+        for area in window.screen.areas:
+            area.tag_redraw()
+
+
+def pending_jobs():
+    """Returns the jobs not finished yet, e.g. to show them in the UI."""
+
+    return [job for job in _alive if not job.finished]
+
+
+def cancel_all():
+    """Cancels every job and stops the worker threads, e.g. when the add-on is disabled."""
+
+    global _shutting_down
+
+    with _condition:
+        for job in _alive:
+            job.cancel()
+        _ready.clear()
+        _waiting.clear()
+        _alive.clear()
+        _shutting_down = True
+        _condition.notify_all()
+    if bpy.app.timers.is_registered(_drain):
+        bpy.app.timers.unregister(_drain)
@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# JSON encoding and decoding for the API responses and the config files.
+#
+# Uses orjson when it is installed in Blender's Python, and the standard
+# library otherwise. iter_array() decodes the elements of a JSON array one
+# by one while its bytes are still coming in.
+
+import codecs
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bytes read from a response at once by iter_array.
+READ_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+def loads(data):
+    """Decodes a JSON document given as bytes or str.
+
+    @raises ValueError: on malformed JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, *, sort_keys=False, indent=None) -> str:
+    if orjson is not None and indent in (None, 2):
+        option = 0
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode('utf8')
+    return json.dumps(obj, sort_keys=sort_keys, indent=indent)
+
+
+def load(f):
+    """Decodes the JSON document of an open file."""
+
+    return loads(f.read())
+
+
+def dump(obj, f, *, sort_keys=False, indent=None):
+    """Encodes obj as JSON into a file opened in text mode."""
+
+    f.write(dumps(obj, sort_keys=sort_keys, indent=indent))
+
+
+def _skip(text, pos, chars):
+    while pos < len(text) and text[pos] in chars:
+        pos += 1
+    return pos
+
+
+def iter_array(chunks):
+    """Yields the elements of the JSON array whose bytes come from the
+    chunks iterable, e.g. response.iter_content(), each one as soon as it
+    is complete.
+
+    @raises ValueError: when the document is not a JSON array or is malformed.
+    """
+    decoder = codecs.getincrementaldecoder('utf8')()
+    chunks = iter(chunks)
+    text = ''
+    pos = 0
+    started = False
+    # What comes next in the array: 'first' element or ']', 'value' after
+    # a ',', or 'separator', i.e. ',' or ']' after a value.
+    expect = 'first'
+    exhausted = False
+
+    while True:
+        pos = _skip(text, pos, _WHITESPACE)
+        if pos < len(text):
+            char = text[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError('Expected a JSON array')
+                started = True
+                pos += 1
+                continue
+            if expect == 'separator' or (expect == 'first' and char == ']'):
+                if char == ']':
+                    return
+                if char != ',':
+                    raise ValueError("Expected ',' or ']' at %r" % text[pos:pos + 20])
+                expect = 'value'
+                pos += 1
+                continue
+            if char in ',]':
+                raise ValueError('Expected a value at %r' % text[pos:pos + 20])
+            try:
+                value, end = _decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # A value is only complete once followed by ',' or ']': a
+                # number cut after '1.' or '2e' continues in the next chunk.
+                following = _skip(text, end, _WHITESPACE)
+                if exhausted or (following < len(text) and text[following] in ',]'):
+                    yield value
+                    pos = end
+                    expect = 'separator'
+                    continue
+        elif exhausted:
+            raise ValueError('Unterminated JSON array' if started else 'Expected a JSON array')
+
+        # Drop what was decoded and read more.
+        text = text[pos:]
+        pos = 0
+        chunk = next(chunks, None)
+        if chunk is None:
+            text += decoder.decode(b'', final=True)
+            exhausted = True
+        else:
+            text += decoder.decode(chunk)
+
+
+def iter_response_array(response):
+    """Yields the elements of the JSON array body of a streamed requests response."""
+
+    return iter_array(response.iter_content(READ_SIZE))
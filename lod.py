@@ -0,0 +1,153 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Decimated levels of detail for heavy imported NFT meshes.
+#
+# The imported object keeps its full mesh and is only rendered. A child
+# proxy object, hidden from renders, shows one of the decimated meshes in
+# the viewport.
+
+import re
+
+import bpy
+
+from . import asset_cache
+
+CACHE_KIND = 'lod'
+DEFAULT_RATIOS = (0.5, 0.1, 0.01)
+
+# Custom properties on the LOD meshes and proxy objects.
+LOD_SOURCE_PROP = 'locki_lod_source'
+LOD_LEVELS_PROP = 'locki_lod_levels'
+
+
+def _source_key(mesh):
+    """Identifies the source mesh independently of the .001 suffixes
+    Blender adds when the same NFT is imported again.
+    """
+
+    base_name = re.sub(r'\.\d{3}$', '', mesh.name)
+    return '%s:%d' % (base_name, len(mesh.vertices))
+
+
+def _decimate(mesh, ratio, name):
+    """Returns a new mesh with the given ratio of the faces of mesh."""
+
+    tmp = bpy.data.objects.new('locki_lod_tmp', mesh)
+    bpy.context.scene.collection.objects.link(tmp)
+    try:
+        modifier = tmp.modifiers.new('Decimate', 'DECIMATE')
+        modifier.ratio = ratio
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        depsgraph.update()
+        decimated = bpy.data.meshes.new_from_object(tmp.evaluated_get(depsgraph))
+    finally:
+        bpy.data.objects.remove(tmp)
+    decimated.name = name
+    return decimated
+
+
+def build_lod_meshes(mesh, ratios=DEFAULT_RATIOS):
+    """Returns one decimated mesh per ratio, from finest to coarsest.
+
+    Every level is decimated from the previous one, which is much cheaper
+    than decimating the full mesh each time.
+    """
+
+    levels = []
+    source, source_ratio = mesh, 1.0
+    for i, ratio in enumerate(sorted(ratios, reverse=True), start=1):
+        decimated = _decimate(source, ratio / source_ratio, '%s_LOD%d' % (mesh.name, i))
+        decimated[LOD_SOURCE_PROP] = _source_key(mesh)
+        levels.append(decimated)
+        source, source_ratio = decimated, ratio
+    return levels
+
+
+def _cache_kind(ratios, min_faces):
+    """The cache entry of the LODs built with these settings, so changing
+    them does not reuse levels built with other ones."""
+
+    return '%s_%s_min%d' % (CACHE_KIND, '_'.join('%g' % r for r in sorted(ratios, reverse=True)),
+                            min_faces)
+
+
+def _cached_levels(digest, kind):
+    meshes = asset_cache.append_objects(digest, kind, 'meshes')
+    if meshes is None:
+        return {}
+
+    levels = {}
+    for mesh in sorted(meshes, key=lambda m: m.name):
+        levels.setdefault(mesh.get(LOD_SOURCE_PROP), []).append(mesh)
+    return levels
+
+
+def generate_lods(objects, digest, ratios=DEFAULT_RATIOS, min_faces=100000, level=2):
+    """Adds viewport LOD proxies to the heavy mesh objects among objects.
+
+    LOD meshes are computed once per NFT content and LOD settings and stored
+    in the asset cache; meshes missing from the cache are decimated and added
+    to it.
+
+    @param level: the LOD level shown in the viewport, 0 for the full mesh.
+    @returns: the new proxy objects.
+    """
+
+    heavy = [obj for obj in objects
+             if obj.type == 'MESH' and len(obj.data.polygons) >= min_faces]
+    if not heavy:
+        return []
+
+    kind = _cache_kind(ratios, min_faces)
+    levels = _cached_levels(digest, kind)
+    missing = {_source_key(obj.data): obj.data for obj in heavy
+               if _source_key(obj.data) not in levels}
+    if missing:
+        for key, mesh in missing.items():
+            levels[key] = build_lod_meshes(mesh, ratios)
+        asset_cache.write_objects(
+            digest, kind, [m for meshes in levels.values() for m in meshes])
+
+    proxies = []
+    for obj in heavy:
+        meshes = levels.get(_source_key(obj.data))
+        if not meshes:
+            continue
+        proxy = bpy.data.objects.new(obj.name + '_LOD', meshes[0])
+        proxy[LOD_LEVELS_PROP] = [mesh.name for mesh in meshes]
+        proxy.hide_render = True
+        proxy.hide_select = True
+        proxy.parent = obj
+        for col in obj.users_collection:
+            col.objects.link(proxy)
+        set_object_level(proxy, level)
+        proxies.append(proxy)
+    return proxies
+
+
+def set_object_level(proxy, level):
+    """Shows the given LOD level of the proxy's parent in the viewport."""
+
+    names = list(proxy[LOD_LEVELS_PROP])
+    source = proxy.parent
+    if level <= 0 or not names:
+        proxy.hide_viewport = True
+        if source is not None:
+            source.hide_viewport = False
+        return
+
+    mesh = bpy.data.meshes.get(names[min(level, len(names)) - 1])
+    if mesh is not None:
+        proxy.data = mesh
+    proxy.hide_viewport = False
+    if source is not None:
+        source.hide_viewport = True
+
+
+def set_viewport_level(scene, level):
+    for obj in scene.objects:
+        if LOD_LEVELS_PROP in obj:
+            set_object_level(obj, level)
+
+
+def update_lod_level(self, context):
+    set_viewport_level(context.scene, self.lod_level)
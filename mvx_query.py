@@ -0,0 +1,124 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Query planning for the MvX API: which endpoint to call for a view of the
+# NFTs, asking only for the fields the add-on reads and filtering on the
+# server instead of downloading every NFT of the account.
+
+import urllib.parse
+
+import requests.exceptions
+
+from . import communication
+from . import jsoncodec
+
+# Fields read by mvx_requests.get_urllist_from_list.
+NFT_FIELDS = ('identifier', 'collection', 'name', 'nonce', 'attributes', 'assets',
+              'media', 'uris')
+
+# Only NFTs and SFTs carry files; MetaESDTs are skipped on the server.
+NFT_TYPES = ('NonFungibleESDT', 'SemiFungibleESDT')
+
+DATA_NFT_COLLECTION = 'DATANFTFT-e0b917'
+
+# Server-side filters of the views of the file_format scene property. The
+# file formats are only known from the urls, so they stay client-side.
+VIEW_FILTERS = {
+    'streamonly': dict(collections=(DATA_NFT_COLLECTION,)),
+}
+
+# NFTs per page of the account listing.
+PAGE_SIZE = 500
+
+# Longest url of a bulk request; longer ones are rejected by the API or proxies.
+MAX_URL_LENGTH = 2000
+
+
+def _url(endpoint_path, params):
+    query = urllib.parse.urlencode(
+        {key: ','.join(value) if isinstance(value, (list, tuple)) else value
+         for key, value in params.items() if value not in (None, (), [])},
+        safe=',')
+    return urllib.parse.urljoin(communication.mvx_endpoint(), endpoint_path) + '?' + query
+
+
+def account_nfts_url(address, start=0, size=PAGE_SIZE, fields=NFT_FIELDS,
+                     collections=(), types=NFT_TYPES):
+    return _url('accounts/%s/nfts' % address,
+                {'from': start, 'size': size, 'fields': fields,
+                 'collections': collections, 'type': types})
+
+
+def nfts_by_identifiers_url(identifiers, fields=NFT_FIELDS):
+    return _url('nfts', {'identifiers': identifiers, 'size': len(identifiers),
+                         'fields': fields})
+
+
+def plan_identifiers(identifiers, max_url_length=MAX_URL_LENGTH, fields=NFT_FIELDS):
+    """Packs the identifiers into as few nfts?identifiers=... requests as
+    the url length allows.
+
+    @returns: list of lists of identifiers, one per request
+    """
+    batches = []
+    batch = []
+    for identifier in dict.fromkeys(identifiers):  # unique, in order
+        if batch and len(nfts_by_identifiers_url(batch + [identifier], fields)) > max_url_length:
+            batches.append(batch)
+            batch = []
+        batch.append(identifier)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _get(url, stream=False):
+    session = communication.locki_id_session()
+    try:
+        r = session.request('get', url, stream=stream, timeout=communication.REQUESTS_TIMEOUT)
+    except (requests.exceptions.HTTPError,
+            requests.exceptions.ConnectionError) as e:
+        raise communication.LockiIdCommError(str(e))
+
+    if r.status_code != 200:
+        r.close()
+        raise communication.LockiIdCommError(f'Error {r.status_code} from {url}')
+    return r
+
+
+def iter_json_array(url):
+    """GETs url from the MvX API and yields the elements of the JSON array
+    it returns while the response is still downloading.
+
+    @raises communication.LockiIdCommError: on connection errors, error
+        status codes or invalid JSON.
+    """
+    r = _get(url, stream=True)
+    try:
+        yield from jsoncodec.iter_response_array(r)
+    except ValueError as e:
+        raise communication.LockiIdCommError(f'Failed to decode JSON: {e}')
+    except requests.exceptions.RequestException as e:
+        raise communication.LockiIdCommError(str(e))
+    finally:
+        r.close()
+
+
+def iter_account_nfts(address, view='none'):
+    """Yields the NFTs of the address shown in the view, one by one as they
+    are decoded, fetching one page at a time."""
+
+    filters = VIEW_FILTERS.get(view, {})
+    start = 0
+    while True:
+        count = 0
+        for nft in iter_json_array(account_nfts_url(address, start=start, **filters)):
+            count += 1
+            yield nft
+        start += count
+        if count < PAGE_SIZE:
+            return
+
+
+def fetch_nfts_by_identifiers(identifiers):
+    """Returns the NFTs with the given identifiers, fetched in one request."""
+
+    return list(iter_json_array(nfts_by_identifiers_url(identifiers)))
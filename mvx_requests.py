@@ -6,13 +6,21 @@ import binascii
 
 
 from . import communication
+from . import jsoncodec
+from . import mvx_query
 from . import profiles
 
 def show_message(input, message):
     def draw(self, context):
         self.layout.label(text=message)
     
-    bpy.context.window_manager.popup_menu(draw, title="Result for "+input, icon='INFO')
+    wm = bpy.context.window_manager
+    if not wm.windows:
+        print(f"Result for {input}: {message}")
+        return
+    # Job callbacks run from a timer, without a window in the context.
+    with bpy.context.temp_override(window=wm.windows[0]):
+        wm.popup_menu(draw, title="Result for "+input, icon='INFO')
 
 def clear_url_64(url):
     # First, decode the base64 string to get a hex string
@@ -41,34 +49,7 @@ def transform_nft_urls_in_menu(nft_url):
     return nft_identifiers
 
 
-def get_nftlist_from_address(address):
-    
-    base_url = communication.mvx_endpoint()
-    endpoint_path = 'accounts/' + address + '/nfts'
-    url = urllib.parse.urljoin(base_url, endpoint_path)
-
-    session = communication.locki_id_session()
-    try:
-        r = session.request('get',
-                            url,
-                            timeout=communication.REQUESTS_TIMEOUT)
-    except (requests.exceptions.HTTPError,
-            requests.exceptions.ConnectionError) as e:
-        raise communication.LockiIdCommError(str(e))
-
-    try:
-        resp = r.json()
-        #print(resp)
-    except ValueError as e:
-        raise communication.LockiIdCommError(f'Failed to decode JSON: {e}')
-
-    if resp is None:
-        raise communication.LockiIdCommError('NFT not found in response')
-
-    return resp
-
 def extract_data_preview_url(metadata_json_url):
-    import json
     import requests
     metadata = []
     try:
@@ -79,7 +60,7 @@ def extract_data_preview_url(metadata_json_url):
             # Get the content of the response
             content = response.text
             # Load the metadata JSON loaded from the file)
-            metadata = json.loads(content)
+            metadata = jsoncodec.loads(content)
         else:
             print(f"Failed to retrieve content. Status code: {response.status_code}")
     except requests.exceptions.RequestException as e:
@@ -99,6 +80,9 @@ def extract_data_preview_url(metadata_json_url):
 
 def get_urllist_from_list(nftlist):
     result = {}
+    # identifier -> metadata.json url, fetched once nftlist is exhausted so
+    # a slow metadata host does not hold up a streamed listing
+    metadata_urls = {}
     for item in nftlist:
         # TODO Here load the datatypes from MvX and handle smart
         # Standard NFT with assets (defi SFT)
@@ -140,10 +124,9 @@ def get_urllist_from_list(nftlist):
             lockiUrl = 'https://app.locki.io/dataNftView?nonce=' + str(nonce) + '&nativeAuthToken=' + profiles.LockiIdProfile.token
             # Check if the end of the decoded URIs is "metadata.json"
             if decoded_uris and decoded_uris[-1].endswith("metadata.json"):
-            # If "metadata.json" is found at the end, set data_preview_url
-                dataPreviewUrl = extract_data_preview_url(decoded_uris[-1])
-            else:
-                dataPreviewUrl = None
+            # If "metadata.json" is found at the end, set data_preview_url below
+                metadata_urls[identifier] = decoded_uris[-1]
+            dataPreviewUrl = None
 
             result[identifier]= {
                 'attributes' : attributes,
@@ -167,8 +150,28 @@ def get_urllist_from_list(nftlist):
                 'url': url,
                 **uri_dict  # This syntax merges the uri_dict into the result dictionary
             }
+
+    for identifier, metadata_url in metadata_urls.items():
+        result[identifier]['dataPreviewUrl'] = extract_data_preview_url(metadata_url)
     return result
 
+def get_nftlist_from_identifiers(identifiers):
+    """Fetches the details of the NFTs with the given identifiers in one request."""
+    return mvx_query.fetch_nfts_by_identifiers(identifiers)
+
+
+def get_nft_urls_from_identifiers(identifiers):
+    """Like get_nft_urls_from_address, for one batch of identifiers."""
+    return get_urllist_from_list(get_nftlist_from_identifiers(identifiers))
+
+
+def get_nft_urls_from_address(address, view='none'):
+    """Fetches the NFTs of the address and extracts their urls. Does not
+    touch bpy, so it can run in a job. Each NFT is converted as soon as it
+    is decoded, the full response is never held in memory; the metadata of
+    the Data NFTs is fetched after the listing is closed."""
+    return get_urllist_from_list(mvx_query.iter_account_nfts(address, view))
+
 def check_address_nonce(address):
     import requests.exceptions
     import urllib
@@ -187,7 +190,7 @@ def check_address_nonce(address):
         raise communication.LockiIdCommError(str(e))
 
     try:
-        resp = r.json()
+        resp = jsoncodec.loads(r.content)
         print(resp)
     except ValueError as e:
         raise communication.LockiIdCommError(f'Failed to decode nonce JSON: {e}')
@@ -0,0 +1,62 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Thumbnails of the NFTs shown in the Locki panel, rendered by render_farm.
+
+import hashlib
+import os
+
+import bpy
+
+# Set/created upon register.
+previews_path = ''
+preview_collection = None
+
+
+def register_paths():
+    global previews_path
+
+    previews_path = bpy.utils.user_resource(
+        'CONFIG', path=os.path.join('locki_id', 'previews'), create=True)
+
+
+def register():
+    global preview_collection
+    import bpy.utils.previews
+
+    register_paths()
+    preview_collection = bpy.utils.previews.new()
+
+
+def unregister():
+    global preview_collection
+    import bpy.utils.previews
+
+    if preview_collection is not None:
+        bpy.utils.previews.remove(preview_collection)
+        preview_collection = None
+
+
+def preview_key(url):
+    return hashlib.sha1(url.encode('utf8')).hexdigest()
+
+
+def preview_file(url):
+    """Returns the path of the thumbnail of the NFT file at url."""
+
+    return os.path.join(previews_path, preview_key(url) + '.png')
+
+
+def get_icon_id(url):
+    """Returns the icon id of the thumbnail of the NFT at url, or 0 when
+    it was not rendered yet.
+    """
+
+    if preview_collection is None or not url:
+        return 0
+
+    key = preview_key(url)
+    if key not in preview_collection:
+        path = preview_file(url)
+        if not os.path.exists(path):
+            return 0
+        preview_collection.load(key, path, 'IMAGE')
+    return preview_collection[key].icon_id
@@ -1,16 +1,33 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 # JNS profile stored in blender, I think we might adjust user name to herotag or bech32
 
+import copy
 import os
+import threading
+import time
 import bpy
 from datetime import datetime, timezone
 
 from . import communication
+from . import filelock
+from . import jsoncodec
 
 # Set/created upon register.
 profiles_path = ''
 profiles_file = ''
 
+# Seconds between two checks for changes made by other Blender instances.
+WATCH_INTERVAL = 2.0
+# An inventory synced by any instance less than this many seconds ago is reused.
+INVENTORY_MAX_AGE = 60.0
+# Seconds to wait for another instance syncing the same inventory.
+SYNC_LOCK_TIMEOUT = 120.0
+
+# Last content read from profiles.json, and the file signature it was read at.
+_cache_data = None
+_cache_signature = None
+_cache_lock = threading.Lock()
+
 
 class _BIPMeta(type):
     """Metaclass for LockiIdProfile."""
@@ -32,6 +49,12 @@ class LockiIdProfile(metaclass=_BIPMeta):
     expires = ''
     nfts = {}
     nonce = 0
+    synced = 0.0  # time of the last inventory sync, by any instance
+    # NFTs of the server-filtered views, by view; apart from the inventory
+    view_nfts = {}
+
+    # signature of profiles.json when it was last read
+    _signature = None
 
     @classmethod
     def reset(cls):
@@ -41,6 +64,8 @@ class LockiIdProfile(metaclass=_BIPMeta):
         cls.expires = ''
         cls.nfts = {}
         cls.nonce = 0
+        cls.synced = 0.0
+        cls.view_nfts = {}
 
     @classmethod
     def read_json(cls):
@@ -49,6 +74,7 @@ class LockiIdProfile(metaclass=_BIPMeta):
         cls.reset()
 
         active_profile = get_active_profile()
+        cls._signature = _cache_signature
         if not active_profile:
             return
 
@@ -62,23 +88,40 @@ class LockiIdProfile(metaclass=_BIPMeta):
     def save_json(cls, make_active_profile=False):
         """Updates the JSON file with the active profile information."""
 
-        jsonfile = get_profiles_data()
-        # check is nfts is a list : 
-        # if not isinstance(cls.nfts, list):
-        #    raise TypeError("Expected nfts to be a list!")
-        
-        jsonfile['profiles'][cls.address] = {
-            'api_key': cls.api_key,
-            'token': cls.token,
-            'expires': cls.expires,
-            'nfts': cls.nfts,
-            'nonce': cls.nonce,
-        }
+        def update(jsonfile):
+            # check is nfts is a list : 
+            # if not isinstance(cls.nfts, list):
+            #    raise TypeError("Expected nfts to be a list!")
+
+            jsonfile['profiles'][cls.address] = {
+                'api_key': cls.api_key,
+                'token': cls.token,
+                'expires': cls.expires,
+                'nfts': cls.nfts,
+                'nonce': cls.nonce,
+                'synced': cls.synced,
+                'view_nfts': cls.view_nfts,
+            }
+
+            if make_active_profile:
+                jsonfile['active_profile'] = cls.address
+
+        update_profiles_data(update)
+        cls._signature = _cache_signature
+
+    @classmethod
+    def reload_if_changed(cls) -> bool:
+        """Reads the JSON file again when another instance changed it."""
 
-        if make_active_profile:
-            jsonfile['active_profile'] = cls.address
+        if filelock.signature(profiles_file) == cls._signature:
+            return False
+        cls.read_json()
+        return True
 
-        save_profiles_data(jsonfile)
+
+def _watch_profiles():
+    LockiIdProfile.reload_if_changed()
+    return WATCH_INTERVAL
 
 
 def register():
@@ -88,44 +131,45 @@ def register():
         'CONFIG', path='locki_id', create=True)
     profiles_file = os.path.join(profiles_path, 'profiles.json')
 
+    # Picks up the logins and syncs of the other Blender instances.
+    bpy.app.timers.register(_watch_profiles, first_interval=WATCH_INTERVAL, persistent=True)
 
-def _create_default_file():
-    """Creates the default profile file, returning its contents."""
-    import json
 
-    profiles_default_data = {
-        'active_profile': None,
-        "profiles": {}
-    }
+def unregister():
+    if bpy.app.timers.is_registered(_watch_profiles):
+        bpy.app.timers.unregister(_watch_profiles)
 
-    os.makedirs(profiles_path, exist_ok=True)
 
-    # Populate the file, ensuring that its permissions are restrictive enough.
-    old_umask = os.umask(0o077)
-    try:
-        with open(profiles_file, 'w', encoding='utf8') as outfile:
-            json.dump(profiles_default_data, outfile)
-    finally:
-        os.umask(old_umask)
+def _write_profiles_file(data):
+    """Writes profiles.json; the caller holds the lock."""
+    global _cache_data, _cache_signature
 
-    return profiles_default_data
+    os.makedirs(profiles_path, exist_ok=True)
+    # Only readable by the user, it holds the tokens.
+    filelock.atomic_write(profiles_file, jsoncodec.dumps(data, sort_keys=True), mode=0o600)
+    with _cache_lock:
+        _cache_data = copy.deepcopy(data)
+        _cache_signature = filelock.signature(profiles_file)
 
 
-def get_profiles_data():
-    """Returns the profiles.json content from a locki_id folder in the
-    locki config directory. If the file does not exist we create one with the
-    basic data structure.
-    """
-    import json
+def _read_profiles_file():
+    """Reads profiles.json, creating or resetting it when needed; the
+    caller holds the lock."""
+
+    profiles_default_data = {
+        'active_profile': None,
+        "profiles": {}
+    }
 
     # if the file does not exist
     if not os.path.exists(profiles_file):
-        return _create_default_file()
+        _write_profiles_file(profiles_default_data)
+        return profiles_default_data
 
     # try parsing the file
     with open(profiles_file, 'r', encoding='utf8') as f:
         try:
-            file_data = json.load(f)
+            file_data = jsoncodec.load(f)
             file_data['active_profile']
             file_data['profiles']
             return file_data
@@ -135,8 +179,96 @@ def get_profiles_data():
                   'Warning: profiles.json is either empty or malformed. '
                   'The file will be reset.' % __name__)
 
-            # overwrite the file
-            return _create_default_file()
+    # overwrite the file
+    _write_profiles_file(profiles_default_data)
+    return profiles_default_data
+
+
+def get_profiles_data():
+    """Returns the profiles.json content from a locki_id folder in the
+    locki config directory. If the file does not exist we create one with the
+    basic data structure.
+
+    The file is only parsed again when its signature (mtime, size, inode)
+    changed, e.g. when another Blender instance saved it.
+    """
+    global _cache_data, _cache_signature
+
+    signature = filelock.signature(profiles_file)
+    with _cache_lock:
+        if signature is not None and signature == _cache_signature:
+            return copy.deepcopy(_cache_data)
+
+    with filelock.locked(profiles_file):
+        file_data = _read_profiles_file()
+        with _cache_lock:
+            _cache_data = copy.deepcopy(file_data)
+            _cache_signature = filelock.signature(profiles_file)
+    return file_data
+
+
+def update_profiles_data(update):
+    """Read-modify-write of profiles.json under an exclusive lock, so the
+    changes other Blender instances saved in the meantime are kept.
+
+    @param update: called with the current content, changes it in place.
+    """
+
+    with filelock.locked(profiles_file):
+        file_data = _read_profiles_file()
+        update(file_data)
+        _write_profiles_file(file_data)
+    return file_data
+
+
+def sync_nfts(address, fetch, max_age=INVENTORY_MAX_AGE):
+    """Returns (nfts, synced time) of the address, calling fetch() unless an
+    instance synced them less than max_age seconds ago. Instances syncing at
+    the same time wait for the first one and reuse its result. Does not
+    touch bpy, so it can run in a job.
+
+    @raises communication.LockiIdCommError: when another instance is still
+        syncing after SYNC_LOCK_TIMEOUT seconds.
+    """
+    try:
+        with filelock.locked(os.path.join(profiles_path, 'sync-' + address),
+                             timeout=SYNC_LOCK_TIMEOUT):
+            return _sync_nfts_locked(address, fetch, max_age)
+    except filelock.LockTimeout:
+        raise communication.LockiIdCommError(
+            'Another Blender instance is still syncing the NFTs of %s' % address)
+
+
+def _sync_nfts_locked(address, fetch, max_age):
+    """The part of sync_nfts() run while holding the sync lock."""
+
+    profile = get_profiles_data()['profiles'].get(address) or {}
+    if time.time() - profile.get('synced', 0) < max_age:
+        return profile['nfts'], profile['synced']
+
+    nfts = fetch()
+    now = time.time()
+
+    def update(jsonfile):
+        stored = jsonfile['profiles'].get(address)
+        if stored is not None:
+            stored['nfts'] = nfts
+            stored['synced'] = now
+
+    update_profiles_data(update)
+    return nfts, now
+
+
+def save_view_nfts(address, view, nfts):
+    """Stores the NFTs of a server-filtered view of the address, leaving its
+    inventory and sync time alone."""
+
+    def update(jsonfile):
+        stored = jsonfile['profiles'].get(address)
+        if stored is not None:
+            stored.setdefault('view_nfts', {})[view] = nfts
+
+    update_profiles_data(update)
 
 
 def get_active_address():
@@ -184,10 +316,9 @@ def get_profile(address):
 
 def save_profiles_data(all_profiles: dict):
     """Saves the profiles data to JSON."""
-    import json
 
-    with open(profiles_file, 'w', encoding='utf8') as outfile:
-        json.dump(all_profiles, outfile, sort_keys=True)
+    with filelock.locked(profiles_file):
+        _write_profiles_file(all_profiles)
 
 def milliseconds_to_iso8601(ms_timestamp):
     # Convert milliseconds since epoch to seconds since epoch
@@ -218,17 +349,14 @@ def logout(address):
     This is different from switching the active profile, where the active
     profile is changed but there isn't an explicit logout.
     """
-    import json
-
-    file_content = get_profiles_data()
 
-    # Remove user from 'active profile'
-    if file_content['active_profile'] == address:
-        file_content['active_profile'] = ""
+    def update(file_content):
+        # Remove user from 'active profile'
+        if file_content['active_profile'] == address:
+            file_content['active_profile'] = ""
 
-    # Remove both user and token from profiles list
-    if address in file_content['profiles']:
-        del file_content['profiles'][address]
+        # Remove both user and token from profiles list
+        if address in file_content['profiles']:
+            del file_content['profiles'][address]
 
-    with open(profiles_file, 'w', encoding='utf8') as outfile:
-        json.dump(file_content, outfile)
+    update_profiles_data(update)
@@ -0,0 +1,219 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Per-host rate limiting of the HTTP requests of the add-on.
+#
+# Each host gets a token bucket capping the request rate, and an AIMD
+# (additive increase, multiplicative decrease) controller for the number of
+# requests in flight: it grows by one every round trip while the responses
+# are fast and successful, and halves on 429, 5xx, connection errors or
+# slow responses. A Retry-After header blocks the host until it expires, up
+# to MAX_RETRY_AFTER; the requests waiting for it check their job's
+# cancellation token, unlike the sleep of urllib3.
+
+import email.utils
+import logging
+import threading
+import time
+import urllib.parse
+
+import requests.adapters
+from requests.packages.urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+DEFAULT_RATE = 10.0  # requests per second
+DEFAULT_BURST = 10
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 8
+INITIAL_CONCURRENCY = 2
+# Responses slower than this, in seconds, count as congestion.
+TARGET_LATENCY = 2.0
+# Seconds between two decreases, so one burst of errors halves the limit once.
+DECREASE_INTERVAL = 1.0
+# Seconds between two checks for cancellation while waiting.
+WAIT_STEP = 0.1
+
+RETRY_STATUSES = (429, 503)
+# Times a 429/503 response is retried, after its Retry-After delay.
+STATUS_RETRIES = 5
+# Longest Retry-After honoured, in seconds; longer ones are cut to this.
+MAX_RETRY_AFTER = 60.0
+# Delay before retrying a 429/503 without Retry-After, doubled each attempt.
+RETRY_BACKOFF = 0.1
+
+
+def parse_retry_after(value) -> float:
+    """Returns the seconds to wait for a Retry-After header value, given
+    either in seconds or as an HTTP date."""
+
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, date.timestamp() - time.time())
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """Takes a token, returning 0, or returns the seconds until one is available."""
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class HostLimiter:
+    def __init__(self, host, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = float(INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency = 0.0  # moving average, in seconds
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Waits for a concurrency slot, a token and the end of any Retry-After block."""
+
+        from . import jobs
+
+        token = jobs.current_token()
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                token.check()
+                self._condition.wait(WAIT_STEP)
+            self.in_flight += 1
+
+        try:
+            while True:
+                token.check()
+                blocked = self.blocked_until - time.monotonic()
+                wait = blocked if blocked > 0 else self.bucket.take()
+                if not wait:
+                    return
+                time.sleep(min(wait, WAIT_STEP))
+        except BaseException:
+            self.release(None, 0.0)
+            raise
+
+    def release(self, status, latency):
+        """Frees the slot and adapts the concurrency limit to the outcome of the request."""
+
+        with self._condition:
+            self.in_flight -= 1
+            self.requests += 1
+            if status is None or status == 429 or status >= 500:
+                self.errors += 1
+                self._decrease()
+            elif latency > TARGET_LATENCY:
+                self._decrease()
+            else:
+                self.limit = min(MAX_CONCURRENCY, self.limit + 1 / self.limit)
+            if status is not None:
+                self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+            self._condition.notify_all()
+
+    def throttle(self, retry_after):
+        """Called for each 429/503 response, blocking the host for
+        retry_after seconds, at most MAX_RETRY_AFTER."""
+
+        retry_after = min(retry_after, MAX_RETRY_AFTER)
+        with self._condition:
+            self.throttled += 1
+            self._decrease()
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                log.info('%s asked to retry after %.1fs', self.host, retry_after)
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_INTERVAL:
+            return
+        self._last_decrease = now
+        self.limit = max(MIN_CONCURRENCY, self.limit / 2)
+
+    def stats(self):
+        return dict(host=self.host, rate=self.bucket.rate, limit=int(self.limit),
+                    in_flight=self.in_flight, requests=self.requests,
+                    throttled=self.throttled, errors=self.errors,
+                    latency_ms=self.latency * 1000,
+                    blocked_for=max(0.0, self.blocked_until - time.monotonic()))
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(host) -> HostLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = HostLimiter(host)
+        return limiter
+
+
+def stats():
+    """Returns the current limits and counters of every host, for the UI."""
+
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
+
+
+class LimitedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter sending each request through the limiter of its host, and
+    retrying 429/503 responses once the host is no longer blocked."""
+
+    def send(self, request, **kwargs):
+        limiter = limiter_for(urllib.parse.urlsplit(request.url).hostname)
+        for attempt in range(STATUS_RETRIES + 1):
+            limiter.acquire()
+            start = time.monotonic()
+            status = None
+            try:
+                response = super().send(request, **kwargs)
+                status = response.status_code
+            finally:
+                limiter.release(status, time.monotonic() - start)
+
+            # Hand the last 429/503 to the caller instead of raising.
+            if status not in RETRY_STATUSES or attempt == STATUS_RETRIES:
+                return response
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            limiter.throttle(retry_after or RETRY_BACKOFF * 2 ** attempt)
+            response.close()
+
+
+def http_adapter():
+    """Returns the adapter mounted on the sessions of the add-on."""
+
+    # urllib3 only retries connection errors, with a short backoff: its
+    # sleep for Retry-After could not be cancelled.
+    retries = Retry(
+        total=5,
+        backoff_factor=0.05,
+        status_forcelist=(),
+        respect_retry_after_header=False,
+    )
+    return LimitedHTTPAdapter(max_retries=retries)
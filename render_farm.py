@@ -0,0 +1,252 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Headless thumbnail rendering of a whole wallet.
+#
+# The coordinator runs in a background Blender, downloads the NFT files of
+# the active profile and hands them out in chunks to a pool of background
+# Blender workers, one per core. Thumbnails go into the preview cache shown
+# in the Locki panel. Already rendered NFTs are skipped, so an interrupted
+# run resumes where it left off.
+#
+# Usage:
+#     blender --background --python scripts/render_farm_cli.py -- [--workers N] [--engine EEVEE]
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+
+import bpy
+
+from . import asset_cache, background, communication, previews, profiles
+
+log = logging.getLogger(__name__)
+
+CLI_SCRIPT = os.path.join(os.path.dirname(__file__), 'scripts', 'render_farm_cli.py')
+SUPPORTED_FORMATS = {'GLB', 'GLTF', 'SVG', 'PY'}
+
+ENGINES = {
+    'WORKBENCH': 'BLENDER_WORKBENCH',
+    # EEVEE Next replaced EEVEE in 4.2 under a new engine identifier
+    'EEVEE': 'BLENDER_EEVEE_NEXT' if bpy.app.version >= (4, 2, 0) else 'BLENDER_EEVEE',
+}
+
+
+def file_format(url):
+    from urllib.parse import urlparse
+
+    _, extension = os.path.splitext(urlparse(url).path)
+    return extension.lstrip('.').upper()
+
+
+def inventory_urls(nfts):
+    """Returns the urls of the importable files of the NFTs of a profile."""
+
+    urls = []
+    for data in nfts.values():
+        for key, url in data.items():
+            if not isinstance(url, str) or not (key.endswith('Url') or key.startswith('uri')):
+                continue
+            if file_format(url) in SUPPORTED_FORMATS and url not in urls:
+                urls.append(url)
+    return urls
+
+
+################################################################
+# coordinator
+################################################################
+
+
+def _render_chunk(urls, settings, job_dir, time_limit=0, memory_limit_mb=0):
+    """Downloads the NFT files and renders them in one background Blender.
+
+    @param time_limit: seconds per NFT file after which the chunk is stopped
+        and skipped, 0 for no limit.
+    @param memory_limit_mb: memory the background Blender may use, 0 for no limit.
+    @returns: the number of thumbnails rendered.
+    """
+
+    jobs = []
+    for url in urls:
+        try:
+            local_path, _ = asset_cache.fetch(url)
+        except communication.LockiIdCommError as e:
+            log.error('Skipping %s: %s', url, e)
+            continue
+        jobs.append(dict(path=local_path, format=file_format(url),
+                         output=previews.preview_file(url)))
+    if not jobs:
+        return 0
+
+    fd, job_file = tempfile.mkstemp(suffix='.json', dir=job_dir)
+    with os.fdopen(fd, 'w', encoding='utf8') as f:
+        json.dump(dict(settings, jobs=jobs), f)
+
+    process = background.start_process(
+        background.blender_command(CLI_SCRIPT, '--worker', job_file),
+        job_file + '.log', memory_limit_mb)
+    try:
+        process.wait(timeout=time_limit * len(jobs) or None)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        log.error('Skipping chunk stopped after %i seconds, see %s.log: %s',
+                  time_limit * len(jobs), job_file, ', '.join(urls))
+    return sum(1 for job in jobs if os.path.exists(job['output']))
+
+
+def main(argv):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    parser = argparse.ArgumentParser(
+        prog='render_farm', description='Render thumbnails of all NFTs of a Locki ID profile.')
+    parser.add_argument('--address', help='profile to render, defaults to the active profile')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of background Blender processes')
+    parser.add_argument('--chunk', type=int, default=8,
+                        help='NFTs rendered per Blender process start')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='WORKBENCH')
+    parser.add_argument('--resolution', type=int, default=256)
+    parser.add_argument('--frames', type=int, default=1,
+                        help='render a turntable of this many frames next to the thumbnail')
+    parser.add_argument('--force', action='store_true',
+                        help='render again NFTs that already have a thumbnail')
+    parser.add_argument('--time-limit', type=int, default=300,
+                        help='seconds per NFT file after which a worker is stopped (0 for no limit)')
+    parser.add_argument('--memory-limit', type=int, default=4096,
+                        help='MB of memory a worker may use (0 for no limit, Linux and macOS only)')
+    args = parser.parse_args(argv)
+
+    profiles.register()
+    asset_cache.register()
+    previews.register_paths()
+
+    data = profiles.get_profiles_data()
+    address = args.address or data['active_profile']
+    if not address or address not in data['profiles']:
+        parser.error('no profile for address %r, log in from Blender first' % address)
+
+    urls = inventory_urls(data['profiles'][address]['nfts'])
+    todo = [url for url in urls
+            if args.force or not os.path.exists(previews.preview_file(url))]
+    print('%d NFT files, %d to render with %d workers' % (len(urls), len(todo), args.workers))
+
+    settings = dict(engine=ENGINES[args.engine], resolution=args.resolution, frames=args.frames)
+    chunks = [todo[i:i + args.chunk] for i in range(0, len(todo), args.chunk)]
+    started = time.monotonic()
+    rendered = 0
+    with tempfile.TemporaryDirectory(prefix='locki_farm_') as job_dir, \
+            ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(_render_chunk, chunk, settings, job_dir,
+                               args.time_limit, args.memory_limit) for chunk in chunks]
+        for future in as_completed(futures):
+            rendered += future.result()
+            print('%d/%d rendered (%.0fs)' % (rendered, len(todo), time.monotonic() - started))
+
+    return 0 if rendered == len(todo) else 1
+
+
+################################################################
+# worker
+################################################################
+
+
+def _import_file(path, fmt):
+    if fmt in {'GLB', 'GLTF'}:
+        bpy.ops.import_scene.gltf(filepath=path)
+    elif fmt == 'SVG':
+        bpy.ops.import_curve.svg(filepath=path)
+    elif fmt == 'PY':
+        with open(path, 'r') as f:
+            source = f.read()
+        exec(compile(source, path, 'exec'), {'__name__': '__main__', '__file__': path})
+
+
+def _bounds(objects):
+    from mathutils import Vector
+
+    corners = [obj.matrix_world @ Vector(corner)
+               for obj in objects if obj.type in {'MESH', 'CURVE', 'FONT', 'SURFACE'}
+               for corner in obj.bound_box]
+    if not corners:
+        return Vector((0, 0, 0)), 1.0
+    low = Vector([min(c[i] for c in corners) for i in range(3)])
+    high = Vector([max(c[i] for c in corners) for i in range(3)])
+    return (low + high) / 2, max((high - low).length, 0.001)
+
+
+def _setup_stage(scene, settings):
+    """Adds a camera framing all objects, on a turntable pivot, and a light."""
+    from mathutils import Vector
+
+    center, size = _bounds(list(scene.objects))
+
+    pivot = bpy.data.objects.new('turntable', None)
+    pivot.location = center
+    scene.collection.objects.link(pivot)
+
+    camera = bpy.data.objects.new('camera', bpy.data.cameras.new('camera'))
+    offset = Vector((1.0, -1.0, 0.7)).normalized() * size * 1.6
+    camera.location = offset
+    camera.rotation_euler = (-offset).to_track_quat('-Z', 'Y').to_euler()
+    camera.data.clip_end = size * 10
+    camera.parent = pivot
+    scene.collection.objects.link(camera)
+    scene.camera = camera
+
+    light = bpy.data.objects.new('light', bpy.data.lights.new('light', 'SUN'))
+    light.rotation_euler = (0.8, 0.2, 0.6)
+    scene.collection.objects.link(light)
+
+    scene.render.engine = settings['engine']
+    scene.render.resolution_x = scene.render.resolution_y = settings['resolution']
+    scene.render.resolution_percentage = 100
+    scene.render.film_transparent = True
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.use_file_extension = False
+    return pivot
+
+
+def _render_to(scene, path):
+    """Renders a still, replacing path only once the image is complete."""
+
+    tmp_path = path + '.tmp'
+    scene.render.filepath = tmp_path
+    bpy.ops.render.render(write_still=True)
+    os.replace(tmp_path, path)
+
+
+def render_thumbnail(path, fmt, output, settings):
+    import math
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    scene = bpy.context.scene
+    _import_file(path, fmt)
+    pivot = _setup_stage(scene, settings)
+
+    frames = settings.get('frames', 1)
+    if frames > 1:
+        turntable_dir = os.path.splitext(output)[0] + '_turntable'
+        os.makedirs(turntable_dir, exist_ok=True)
+        for frame in range(frames):
+            pivot.rotation_euler.z = 2 * math.pi * frame / frames
+            _render_to(scene, os.path.join(turntable_dir, '%04d.png' % frame))
+        pivot.rotation_euler.z = 0
+
+    _render_to(scene, output)
+
+
+def worker_main(argv):
+    with open(argv[0], 'r', encoding='utf8') as f:
+        settings = json.load(f)
+
+    failed = 0
+    for job in settings.pop('jobs'):
+        try:
+            render_thumbnail(job['path'], job['format'], job['output'], settings)
+        except Exception:
+            log.exception('Error rendering %s', job['path'])
+            failed += 1
+    return 1 if failed else 0
@@ -4,10 +4,17 @@ Collection:
 Blender version : 3.6.2 
 """
 
+import collections
+import os
 import random
 import time
 import bpy
 
+from .. import batch_mode
+from .. import handlers
+from . import keyframes
+from . import node_builder
+
 
 ################################################################
 # helper functions BEGIN
@@ -66,6 +73,171 @@ def clean_scene():
     purge_orphans()
 
 
+# bpy.data collections scanned for orphan data blocks by purge_orphans_iterative()
+ORPHAN_ID_TYPES = (
+    "objects", "meshes", "curves", "materials", "textures", "images",
+    "node_groups", "actions", "particles", "lights", "cameras", "lattices",
+    "metaballs", "fonts", "armatures", "grease_pencils", "worlds",
+)
+
+
+def purge_orphans_iterative():
+    """
+    Remove the data blocks without users with bpy.data.batch_remove,
+    repeating until removing them leaves no new orphans behind.
+    Returns the number of removed data blocks per type.
+    """
+    removed = {}
+    while True:
+        orphans = []
+        for id_type in ORPHAN_ID_TYPES:
+            ids = [id_ for id_ in getattr(bpy.data, id_type) if id_.users == 0]
+            if ids:
+                removed[id_type] = removed.get(id_type, 0) + len(ids)
+                orphans.extend(ids)
+        if not orphans:
+            return removed
+        bpy.data.batch_remove(orphans)
+
+
+def fast_clean_scene():
+    """
+    Same result as clean_scene(), through the data API instead of operators:
+    objects, collections and worlds are removed with one batch_remove call.
+    Returns (removed data blocks per type, seconds spent).
+    """
+    start = time.perf_counter()
+
+    # make sure the active object is not in Edit Mode
+    if bpy.context.active_object and bpy.context.active_object.mode == "EDIT":
+        bpy.ops.object.editmode_toggle()
+
+    removed = {
+        "objects": len(bpy.data.objects),
+        "collections": len(bpy.data.collections),
+        "worlds": len(bpy.data.worlds),
+    }
+    bpy.data.batch_remove(list(bpy.data.objects) + list(bpy.data.collections) + list(bpy.data.worlds))
+
+    # create a new world data block, with the Background node set_scene_props expects
+    world = bpy.data.worlds.new("World")
+    world.use_nodes = True
+    bpy.context.scene.world = world
+
+    for id_type, count in purge_orphans_iterative().items():
+        removed[id_type] = removed.get(id_type, 0) + count
+
+    return removed, time.perf_counter() - start
+
+
+def scene_template_path():
+    """
+    returns the path of the template .blend in the add-on config directory
+    """
+    config_dir = bpy.utils.user_resource("CONFIG", path="locki_id", create=True)
+    return os.path.join(config_dir, "scene_template.blend")
+
+
+def save_scene_template(scene):
+    """
+    Save the scene, and the data it uses, as the starting state restored
+    by reset_from_template()
+    """
+    path = scene_template_path()
+    bpy.data.libraries.write(path, {scene}, fake_user=True, compress=True)
+    return path
+
+
+# names of the bpy.data collections of the ID types, to report the removed data
+DATA_ID_TYPES = {
+    "MESH": "meshes", "CURVE": "curves", "MATERIAL": "materials", "ACTION": "actions",
+    "WORLD": "worlds", "LIGHT": "lights", "CAMERA": "cameras", "LATTICE": "lattices",
+    "META": "metaballs", "FONT": "fonts", "ARMATURE": "armatures",
+    "GREASEPENCIL": "grease_pencils",
+}
+
+
+def _only_used_by(refs):
+    """
+    returns the data blocks of the refs Counter whose every user is
+    counted in it, i.e. that nothing outside of the removed data uses
+    """
+    return [id_ for id_, count in refs.items() if id_.users <= count and not id_.use_fake_user]
+
+
+def _owned_data(scene, objects):
+    """
+    returns the data of the objects (meshes, curves, ...), their materials
+    and actions, and the world of the scene, that nothing else uses
+    """
+    refs = collections.Counter()
+    for obj in objects:
+        if obj.data is not None:
+            refs[obj.data] += 1
+        if obj.animation_data and obj.animation_data.action:
+            refs[obj.animation_data.action] += 1
+        for slot in obj.material_slots:
+            if slot.link == "OBJECT" and slot.material:
+                refs[slot.material] += 1
+    if scene.world is not None:
+        refs[scene.world] += 1
+    owned = _only_used_by(refs)
+
+    refs = collections.Counter()
+    for data in owned:
+        for mat in getattr(data, "materials", ()):
+            if mat is not None:
+                refs[mat] += 1
+        if getattr(data, "animation_data", None) and data.animation_data.action:
+            refs[data.animation_data.action] += 1
+    # materials also referenced by object slots
+    for obj in objects:
+        for slot in obj.material_slots:
+            if slot.link == "OBJECT" and slot.material in refs:
+                refs[slot.material] += 1
+    owned.extend(id_ for id_ in _only_used_by(refs) if id_ not in owned)
+    return owned
+
+
+def reset_from_template():
+    """
+    Swap the current scene for a fresh copy appended from the template,
+    then drop the old scene, its objects and collections and the data only
+    they used in one batch_remove call.
+    Returns (removed data blocks per type, seconds spent).
+    """
+    start = time.perf_counter()
+
+    # make sure the active object is not in Edit Mode
+    if bpy.context.active_object and bpy.context.active_object.mode == "EDIT":
+        bpy.ops.object.editmode_toggle()
+
+    old_scene = bpy.context.scene
+    with bpy.data.libraries.load(scene_template_path(), link=False) as (data_from, data_to):
+        data_to.scenes = data_from.scenes[:1]
+    new_scene = data_to.scenes[0]
+    new_scene.use_fake_user = False
+
+    for window in bpy.context.window_manager.windows:
+        if window.scene == old_scene:
+            window.scene = new_scene
+
+    # objects and collections only used by the old scene go with it
+    old_objects = [obj for obj in old_scene.objects if len(obj.users_scene) == 1]
+    old_collections = [coll for coll in old_scene.collection.children_recursive
+                       if tuple(coll.users_scene) == (old_scene,)]
+    old_data = _owned_data(old_scene, old_objects)
+    removed = {"scenes": 1, "objects": len(old_objects), "collections": len(old_collections)}
+    for id_ in old_data:
+        id_type = DATA_ID_TYPES.get(id_.id_type, id_.id_type.lower())
+        removed[id_type] = removed.get(id_type, 0) + 1
+    name = old_scene.name
+    bpy.data.batch_remove([old_scene] + old_objects + old_collections + old_data)
+    new_scene.name = name
+
+    return removed, time.perf_counter() - start
+
+
 def active_object():
     """
     returns the currently active object
@@ -88,8 +260,10 @@ def time_seed():
     return seed
 
 
-def set_fcurve_extrapolation_to_linear():
-    for fc in bpy.context.active_object.animation_data.action.fcurves:
+def set_fcurve_extrapolation_to_linear(obj=None):
+    if obj is None:
+        obj = bpy.context.active_object
+    for fc in obj.animation_data.action.fcurves:
         fc.extrapolation = "LINEAR"
 
 def stop_anim(scene):
@@ -108,28 +282,23 @@ def create_data_animation_loop(obj, data_path, start_value, mid_value, start_fra
     scene = bpy.context.scene
     
     if scene.frame_current == scene["end"]:  # &gt;=  may be better.
-        bpy.app.handlers.frame_change_pre.append(stop_anim)
+        handlers.register_handler("frame_change_pre", stop_anim)
 
     bpy.ops.screen.animation_cancel(restore_frame=0)
-    # set the start value
-    setattr(obj, data_path, start_value)
-    # add a keyframe at the start
-    obj.keyframe_insert(data_path, frame=start_frame)
 
-    # set the middle value
-    setattr(obj, data_path, mid_value)
-    # add a keyframe in the middle
+    # key the start, middle and end values in one go
     mid_frame = start_frame + (loop_length) / 2
-    obj.keyframe_insert(data_path, frame=mid_frame)
-
-    # set the end value
-    setattr(obj, data_path, start_value)
-    # add a keyframe in the end
     end_frame = start_frame + loop_length
-    obj.keyframe_insert(data_path, frame=end_frame)
+    keyframes.bake_keyframes(
+        obj,
+        data_path,
+        frames=(start_frame, mid_frame, end_frame),
+        values=(start_value, mid_value, start_value),
+    )
+    setattr(obj, data_path, start_value)
 
     if linear_extrapolation:
-        set_fcurve_extrapolation_to_linear()
+        set_fcurve_extrapolation_to_linear(obj)
 
 
 def set_scene_props(fps, frame_count):
@@ -150,20 +319,29 @@ def set_scene_props(fps, frame_count):
     scene.frame_start = 1
 
 
-def scene_setup():
+def scene_setup(seed=None, fast=True):
+    """
+    Clean the scene and set the animation loop properties.
+    A seed of None seeds random from the time.
+    Returns the statistics of fast_clean_scene(), or None when not fast.
+    """
     fps = 30
     loop_seconds = 12
     frame_count = fps * loop_seconds
 
-    seed = 0
-    if seed:
+    if seed is not None:
         random.seed(seed)
     else:
         time_seed()
 
-    clean_scene()
+    stats = None
+    if fast:
+        stats = fast_clean_scene()
+    else:
+        clean_scene()
 
     set_scene_props(fps, frame_count)
+    return stats
 
 
 ################################################################
@@ -186,48 +364,100 @@ def create_node(node_tree, type_name, node_x_location, node_location_step_x=0):
     return node_obj, node_x_location
 
 
-def update_geo_node_tree(node_tree):
+def centerpiece_spec():
     """
+    Node tree spec of the centerpiece
 
     Geo Node type names found here
     https://docs.blender.org/api/current/bpy.types.GeometryNode.html
     """
-    out_node = node_tree.nodes["Group Output"]
-
-    node_x_location = 0
-    node_location_step_x = 300
-  
-    out_node.location.x = node_x_location
+    return {
+        "name": "Centerpiece",
+        "nodes": {
+            "input": {"type": "NodeGroupInput", "location": (-300, 0)},
+            "output": {"type": "NodeGroupOutput", "location": (0, 0)},
+        },
+        "links": [
+            ("input", 0, "output", 0),
+        ],
+    }
 
 
 def create_centerpiece():
     # add the primitive
     bpy.ops.mesh.primitive_plane_add()
 
-    bpy.ops.node.new_geometry_nodes_modifier()
-    node_tree = bpy.data.node_groups["Geometry Nodes"]
-    update_geo_node_tree(node_tree)
+    # every centerpiece shares the node group built from the same spec
+    node_builder.add_node_group_modifier(bpy.context.active_object, centerpiece_spec())
 
     bpy.ops.object.modifier_add(type="SOLIDIFY")
 
 
-def main():
+def main(seed=None, fast=True):
     """
     Python code to generate an animated geo nodes node tree
     that consists of a subdivided & triangulated cube with animated faces
     """
-    scene_setup()
+    stats = scene_setup(seed, fast)
     create_centerpiece()
+    return stats
 
+@batch_mode.heavy_operator
 class MESH_OT_clean_scene(bpy.types.Operator):
     bl_idname = "mesh.clean_scene"
     bl_label = "Clean the whole scene"
     bl_options = {"REGISTER", "UNDO"}
+
+    use_template: bpy.props.BoolProperty(
+        name="Use Template",
+        default=True,
+        description="Swap in a fresh copy of the saved template scene, when there is one",
+    )
+
+    fast: bpy.props.BoolProperty(
+        name="Fast",
+        default=True,
+        description="Remove the data with bpy.data.batch_remove instead of the select and delete operators",
+    )
     
     def execute(self, context):
         # import addon_utils
         # addon_utils.load_scripts(*, reload_scripts=True, refresh_scripts=True)
         if bpy.context.screen.is_animation_playing:
             bpy.ops.screen.animation_play()
-        main()
-        return {"FINISHED"}
\ No newline at end of file
+        if self.use_template and os.path.exists(scene_template_path()):
+            time_seed()
+            stats = reset_from_template()
+        else:
+            stats = main(fast=self.fast)
+        if stats:
+            removed, seconds = stats
+            self.report({"INFO"}, f"Removed {sum(removed.values())} data blocks in {seconds * 1000:.0f} ms")
+            print(f"clean scene: {removed} in {seconds:.3f}s")
+        return {"FINISHED"}
+
+class MESH_OT_save_scene_template(bpy.types.Operator):
+    """Save the current scene as the starting state of Clear Scene"""
+
+    bl_idname = "mesh.save_scene_template"
+    bl_label = "Save scene as template"
+
+    def execute(self, context):
+        path = save_scene_template(context.scene)
+        self.report({"INFO"}, f"Scene template saved to {path}")
+        return {"FINISHED"}
+
+
+class MESH_OT_remove_scene_template(bpy.types.Operator):
+    """Forget the saved template, Clear Scene builds the scene from scratch again"""
+
+    bl_idname = "mesh.remove_scene_template"
+    bl_label = "Remove scene template"
+
+    @classmethod
+    def poll(cls, context):
+        return os.path.exists(scene_template_path())
+
+    def execute(self, context):
+        os.remove(scene_template_path())
+        return {"FINISHED"}
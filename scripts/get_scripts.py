@@ -1,8 +1,54 @@
+import bmesh
 import bpy
+import numpy as np
 
 # Import home made scripts
+from .. import batch_mode
+from . import keyframes
+from . import node_builder
+from . import object_pool
+
+def new_subdiv_monkey():
+    """Pool factory: a monkey object with a subdivision surface modifier"""
+    mesh = object_pool.shared_mesh("Monkey", lambda bm: bmesh.ops.create_monkey(bm))
+    obj = bpy.data.objects.new("Suzanne", mesh)
+    obj.modifiers.new("Subdivision", "SUBSURF")
+    return obj
+
+
+def new_wireframe_cube():
+    """Pool factory: a cube object with a wireframe modifier"""
+    mesh = object_pool.shared_mesh("Wire Cube", lambda bm: bmesh.ops.create_cube(bm, size=5))
+    obj = bpy.data.objects.new("Cube", mesh)
+    wireframe_modifier = obj.modifiers.new("Wireframe", "WIREFRAME")
+    wireframe_modifier.use_replace = True
+    wireframe_modifier.thickness = 0.05  # Adjust the wireframe thickness as needed
+    return obj
+
+
+def reuse_subdiv_monkey_obj(size, subdiv_viewport_levels, subdiv_render_levels, shade_smooth):
+    """Same as add_subdiv_monkey_obj, re-parameterizing the pooled monkey"""
+    monkey = object_pool.acquire("subdiv_monkey", 1, new_subdiv_monkey)[0]
+    monkey.location = bpy.context.scene.cursor.location
+    # the pooled mesh has the size 2 of primitive_monkey_add
+    monkey.scale = (size / 2, size / 2, size / 2)
+
+    subdivision = monkey.modifiers["Subdivision"]
+    subdivision.levels = subdiv_viewport_levels
+    subdivision.render_levels = subdiv_render_levels
+
+    polygons = monkey.data.polygons
+    polygons.foreach_set("use_smooth", [shade_smooth] * len(polygons))
+    monkey.data.update()
+
+    bpy.context.view_layer.objects.active = monkey
+    return monkey
+
+
+def add_subdiv_monkey_obj(size, subdiv_viewport_levels, subdiv_render_levels, shade_smooth, reuse=False):
+    if reuse:
+        return reuse_subdiv_monkey_obj(size, subdiv_viewport_levels, subdiv_render_levels, shade_smooth)
 
-def add_subdiv_monkey_obj(size, subdiv_viewport_levels, subdiv_render_levels, shade_smooth):
     bpy.ops.mesh.primitive_monkey_add(size=size)
 
     bpy.ops.object.modifier_add(type="SUBSURF")
@@ -13,6 +59,7 @@ def add_subdiv_monkey_obj(size, subdiv_viewport_levels, subdiv_render_levels, sh
         bpy.ops.object.shade_smooth()
 
 
+@batch_mode.heavy_operator
 class MESH_OT_add_subdiv_monkey(bpy.types.Operator):
     """Create a new monkey mesh object with a subdivision surf modifier and shaded smooth"""
 
@@ -48,79 +95,189 @@ class MESH_OT_add_subdiv_monkey(bpy.types.Operator):
         description="Apply Smooth Shading to the mesh",
     )
 
+    reuse: bpy.props.BoolProperty(
+        name="Reuse",
+        default=True,
+        description="Re-parameterize the monkey of the previous run instead of adding a new one",
+    )
+
     def execute(self, context):
 
         add_subdiv_monkey_obj(self.mesh_size, self.subdiv_viewport_lvl,
-                              self.subdiv_render_lvl, self.shade_smooth)
+                              self.subdiv_render_lvl, self.shade_smooth, self.reuse)
 
         return {"FINISHED"}
 
+def animate_rotation(obj, rotation, frames, rotation_values, animation="BAKED", phase=0.0):
+    """
+    BAKED keys every frame on the object's own action,
+    SHARED plays a single shared cyclic action through the NLA
+    """
+    if animation == "SHARED":
+        if rotation:
+            scene = bpy.context.scene
+            action = keyframes.cyclic_rotation_action(rotation)
+            keyframes.play_shared_action(obj, action, scene.frame_start, scene.frame_end, phase)
+    else:
+        keyframes.bake_keyframes(obj, "rotation_euler", frames, rotation_values)
+
 # Function to create an array of cubes with a wireframe modifier
-def create_wireframe_cube_array(center, num_cubes, radius, size, rotation):
-    import math
+def create_wireframe_cube_array(center, num_cubes, radius, size, rotation, animation="BAKED", phase_step=0.0, reuse=False):
     cube_array = []
+
+    bpy.context.scene.frame_start = 1
+    bpy.context.scene.frame_end = 360  # Adjust as needed
+    # same rotation keys for every cube, computed once
+    frames, rotation_values = keyframes.rotation_frames(
+        bpy.context.scene.frame_start, bpy.context.scene.frame_end, rotation)
+
+    if reuse:
+        points = cube_array_points(center, num_cubes, radius)
+        cube_array = object_pool.acquire("wireframe_cube_array", len(points), new_wireframe_cube)
+        object_pool.set_vectors("wireframe_cube_array", "location", points)
+        object_pool.set_vectors("wireframe_cube_array", "rotation_euler", np.zeros_like(points))
+        for index, cube in enumerate(cube_array):
+            keyframes.clear_animation(cube)
+            animate_rotation(cube, rotation, frames, rotation_values, animation, phase=index * phase_step)
+        return cube_array
     
-    for i in range(num_cubes):
-        angle_x = math.radians(360 / num_cubes * i)
-        
-        for j in range(num_cubes):
-            angle_y = math.radians(360 / num_cubes * j)
-            
-            x = center[0] + radius * math.cos(angle_x) * math.cos(angle_y)
-            y = center[1] + radius * math.cos(angle_x) * math.sin(angle_y)
-            z = center[2] + radius * math.sin(angle_x)
-            
-            # Create a cube and add it to the array
-            bpy.ops.mesh.primitive_cube_add(size=5, location=(x, y, z))
-            cube = bpy.context.active_object
-            
-            # Create a wireframe modifier and set its properties
-            bpy.ops.object.modifier_add(type='WIREFRAME')
-            wireframe_modifier = cube.modifiers[-1]
-            wireframe_modifier.use_replace = True
-            wireframe_modifier.thickness = 0.05  # Adjust the wireframe thickness as needed
-            
-            # Create keyframes for the rotation of the cube
-            bpy.context.view_layer.objects.active = cube
-            cube.rotation_euler = (0, 0, 0)
-            cube.keyframe_insert(data_path="rotation_euler", frame=1)
-            
-            bpy.context.scene.frame_start = 1
-            bpy.context.scene.frame_end = 360  # Adjust as needed
-            
-            for frame in range(1, bpy.context.scene.frame_end + 1):
-                cube.rotation_euler.x = math.radians(rotation * frame)
-                cube.rotation_euler.y = math.radians(rotation * frame)
-                cube.keyframe_insert(data_path="rotation_euler", frame=frame)
-            
-            cube_array.append(cube)
+    for index, (x, y, z) in enumerate(cube_array_points(center, num_cubes, radius)):
+        # Create a cube and add it to the array
+        bpy.ops.mesh.primitive_cube_add(size=5, location=(x, y, z))
+        cube = bpy.context.active_object
+
+        # Create a wireframe modifier and set its properties
+        bpy.ops.object.modifier_add(type='WIREFRAME')
+        wireframe_modifier = cube.modifiers[-1]
+        wireframe_modifier.use_replace = True
+        wireframe_modifier.thickness = 0.05  # Adjust the wireframe thickness as needed
+
+        # Create keyframes for the rotation of the cube
+        bpy.context.view_layer.objects.active = cube
+        animate_rotation(cube, rotation, frames, rotation_values, animation, phase=index * phase_step)
+
+        cube_array.append(cube)
     
     return cube_array
 
-def add_rotating_cube_obj(center, num_cubes, radius, size, rotation):
+def cube_array_points(center, num_cubes, radius):
+    """Returns the (num_cubes², 3) array of the cube locations of the array"""
+    angles = np.radians(360 / num_cubes * np.arange(num_cubes))
+    angle_x, angle_y = np.meshgrid(angles, angles, indexing="ij")
+    points = np.column_stack((
+        center[0] + radius * np.cos(angle_x) * np.cos(angle_y),
+        center[1] + radius * np.cos(angle_x) * np.sin(angle_y),
+        center[2] + radius * np.sin(angle_x),
+    ))
+    return points.reshape(-1, 3)
+
+
+def wireframe_cube_spec(size, thickness):
+    """Node tree spec of a wireframe cube: the cube edges swept by a small circle"""
+    return {
+        "name": "Wireframe Cube",
+        "inputs": [],
+        "nodes": {
+            "cube": {"type": "GeometryNodeMeshCube", "inputs": {"Size": (size, size, size)},
+                     "location": (0, 0)},
+            "mesh_to_curve": {"type": "GeometryNodeMeshToCurve", "location": (250, 0)},
+            "profile": {"type": "GeometryNodeCurvePrimitiveCircle",
+                        "inputs": {"Resolution": 4, "Radius": thickness / 2},
+                        "location": (250, -200)},
+            "curve_to_mesh": {"type": "GeometryNodeCurveToMesh", "location": (500, 0)},
+            "output": {"type": "NodeGroupOutput", "location": (750, 0)},
+        },
+        "links": [
+            ("cube", "Mesh", "mesh_to_curve", "Mesh"),
+            ("mesh_to_curve", "Curve", "curve_to_mesh", "Curve"),
+            ("profile", "Curve", "curve_to_mesh", "Profile Curve"),
+            ("curve_to_mesh", "Mesh", "output", 0),
+        ],
+    }
+
+
+def cube_array_spec(size, thickness, rotation):
+    """
+    Node tree spec instancing a wireframe cube on every input point,
+    rotating the instances by rotation degrees per scene frame
+    """
     import math
-     # Create the main rotating cube
-    bpy.ops.mesh.primitive_cube_add(size=5, location=center)
-    main_cube = bpy.context.active_object
 
-    # Add a wireframe modifier to the main cube and set its properties
-    bpy.ops.object.modifier_add(type='WIREFRAME')
-    wireframe_modifier = main_cube.modifiers[-1]
-    wireframe_modifier.use_replace = True
-    wireframe_modifier.thickness = 0.05  # Adjust the wireframe thickness as needed
+    return {
+        "name": "Wireframe Cube Array",
+        "nodes": {
+            "input": {"type": "NodeGroupInput", "location": (0, 0)},
+            "cube": {"type": "GeometryNodeGroup", "node_tree": wireframe_cube_spec(size, thickness),
+                     "location": (0, -200)},
+            # rotation driven by the scene frame
+            "scene_time": {"type": "GeometryNodeInputSceneTime", "location": (0, -400)},
+            "angle": {"type": "ShaderNodeMath", "props": {"operation": "MULTIPLY"},
+                      "inputs": {1: math.radians(rotation)}, "location": (250, -400)},
+            "euler": {"type": "ShaderNodeCombineXYZ", "location": (500, -400)},
+            "instance": {"type": "GeometryNodeInstanceOnPoints", "location": (750, 0)},
+            "output": {"type": "NodeGroupOutput", "location": (1000, 0)},
+        },
+        "links": [
+            ("scene_time", "Frame", "angle", 0),
+            ("angle", "Value", "euler", "X"),
+            ("angle", "Value", "euler", "Y"),
+            ("input", 0, "instance", "Points"),
+            ("cube", 0, "instance", "Instance"),
+            ("euler", "Vector", "instance", "Rotation"),
+            ("instance", "Instances", "output", 0),
+        ],
+    }
+
+
+def create_instanced_cube_array(center, num_cubes, radius, size, rotation):
+    """
+    Same array as create_wireframe_cube_array, as a single object:
+    a point cloud mesh whose Geometry Nodes modifier instances the cubes
+    """
+    points = cube_array_points(center, num_cubes, radius)
+
+    mesh = bpy.data.meshes.new("Cube Array")
+    mesh.vertices.add(len(points))
+    mesh.vertices.foreach_set("co", points.ravel())
+    obj = bpy.data.objects.new("Cube Array", mesh)
+    bpy.context.collection.objects.link(obj)
+
+    node_builder.add_node_group_modifier(obj, cube_array_spec(size=5, thickness=0.05, rotation=rotation), "Cube Array")
+
+    bpy.context.scene.frame_start = 1
+    bpy.context.scene.frame_end = 360  # Adjust as needed
+    return obj
+
+
+def add_rotating_cube_obj(center, num_cubes, radius, size, rotation, array_mode="OBJECTS",
+                          animation="BAKED", phase_step=0.0, reuse=False):
+    if reuse:
+        # Take the main rotating cube of the previous run
+        main_cube = object_pool.acquire("rotating_cube", 1, new_wireframe_cube)[0]
+        main_cube.location = center
+        keyframes.clear_animation(main_cube)
+        bpy.context.view_layer.objects.active = main_cube
+    else:
+        # Create the main rotating cube
+        bpy.ops.mesh.primitive_cube_add(size=5, location=center)
+        main_cube = bpy.context.active_object
+
+        # Add a wireframe modifier to the main cube and set its properties
+        bpy.ops.object.modifier_add(type='WIREFRAME')
+        wireframe_modifier = main_cube.modifiers[-1]
+        wireframe_modifier.use_replace = True
+        wireframe_modifier.thickness = 0.05  # Adjust the wireframe thickness as needed
 
     # Set up rotation animation for the main cube
     bpy.context.view_layer.objects.active = main_cube
     main_cube.rotation_euler = center
-    main_cube.keyframe_insert(data_path="rotation_euler", frame=1)
 
     bpy.context.scene.frame_start = 1
     bpy.context.scene.frame_end = 360  # Adjust as needed
 
-    for frame in range(1, bpy.context.scene.frame_end + 1):
-        main_cube.rotation_euler.x = math.radians(rotation * frame)
-        main_cube.rotation_euler.y = math.radians(rotation * frame)
-        main_cube.keyframe_insert(data_path="rotation_euler", frame=frame)
+    frames, rotation_values = keyframes.rotation_frames(
+        bpy.context.scene.frame_start, bpy.context.scene.frame_end, rotation, z=center[2])
+    animate_rotation(main_cube, rotation, frames, rotation_values, animation)
 
     # Create an array of 10 smaller cubes around the main cube
     num_cubes_outer = 10  # Number of smaller cubes in the outer array
@@ -132,8 +289,15 @@ def add_rotating_cube_obj(center, num_cubes, radius, size, rotation):
     # Update the scene
     bpy.context.view_layer.update()
 
-    create_wireframe_cube_array(center=center, num_cubes=num_cubes_outer, radius=radius_outer, size=size_outer, rotation=rotation)
+    if array_mode == "INSTANCES":
+        # Hide the pooled cubes of an earlier OBJECTS run
+        object_pool.release("wireframe_cube_array")
+        create_instanced_cube_array(center=center, num_cubes=num_cubes_outer, radius=radius_outer, size=size_outer, rotation=rotation)
+    else:
+        create_wireframe_cube_array(center=center, num_cubes=num_cubes_outer, radius=radius_outer, size=size_outer, rotation=rotation,
+                                    animation=animation, phase_step=phase_step, reuse=reuse)
 
+@batch_mode.heavy_operator
 class MESH_OT_add_rotating_cube_obj(bpy.types.Operator):
     bl_idname = "mesh.add_rotating_cube"
     bl_label = "Add rotating cube Object"
@@ -171,9 +335,42 @@ class MESH_OT_add_rotating_cube_obj(bpy.types.Operator):
         description= "rotation of the object",
     )
 
+    array_mode: bpy.props.EnumProperty(
+        name="array",
+        items=(
+            ("OBJECTS", "Objects", "One object per cube of the outer array"),
+            ("INSTANCES", "Instances", "A single object instancing the cubes with Geometry Nodes"),
+        ),
+        default="OBJECTS",
+        description="How the outer cubes are created",
+    )
+
+    animation: bpy.props.EnumProperty(
+        name="animation",
+        items=(
+            ("BAKED", "Baked", "Key the rotation of every cube at every frame"),
+            ("SHARED", "Shared Cycle", "All cubes play one shared cyclic action through the NLA"),
+        ),
+        default="BAKED",
+        description="How the rotation of the cubes is animated",
+    )
+
+    phase_step: bpy.props.FloatProperty(
+        name="phase step",
+        default=0.0,
+        description="Frames of phase offset between two consecutive cubes, with a shared cycle",
+    )
+
+    reuse: bpy.props.BoolProperty(
+        name="reuse",
+        default=True,
+        description="Re-parameterize the cubes of the previous run instead of adding new ones",
+    )
+
     def execute(self, context):
 
-        add_rotating_cube_obj( self.center, self.num_cubes, self.size ,self.radius, self.rotation)
+        add_rotating_cube_obj( self.center, self.num_cubes, self.size ,self.radius, self.rotation, self.array_mode,
+                               self.animation, self.phase_step, self.reuse)
         bpy.ops.screen.animation_play()
         
         return {"FINISHED"}
@@ -0,0 +1,150 @@
+"""
+Bulk keyframe baking
+
+Writes whole animation curves at once with keyframe_points.add() and
+foreach_set(), instead of one keyframe_insert() call per frame, each of
+which goes through RNA, the undo system and the depsgraph.
+"""
+
+import bpy
+import numpy as np
+
+
+def _keyframe_enum_value(prop_name, identifier):
+    return bpy.types.Keyframe.bl_rna.properties[prop_name].enum_items[identifier].value
+
+
+def get_action(obj, action_name=None):
+    """
+    returns the action of the object, creating it if needed
+    """
+    anim_data = obj.animation_data or obj.animation_data_create()
+    if anim_data.action is None:
+        anim_data.action = bpy.data.actions.new(action_name or f"{obj.name}Action")
+    return anim_data.action
+
+
+def bake_fcurve(action, data_path, index, frames, values, interpolation="BEZIER", group=None):
+    """
+    Replaces the keyframes of the F-Curve (data_path, index) of the action.
+    frames and values are 1D arrays of the same length.
+    """
+    fcurve = action.fcurves.find(data_path, index=index)
+    if fcurve is None:
+        fcurve = action.fcurves.new(data_path, index=index, action_group=group or "")
+
+    # keys of an earlier bake would otherwise stay next to the new ones
+    fcurve.keyframe_points.clear()
+    count = len(frames)
+    fcurve.keyframe_points.add(count)
+
+    co = np.empty(2 * count, dtype=np.float32)
+    co[0::2] = frames
+    co[1::2] = values
+    fcurve.keyframe_points.foreach_set("co", co)
+
+    for prop_name, identifier in (("interpolation", interpolation),
+                                  ("handle_left_type", "AUTO_CLAMPED"),
+                                  ("handle_right_type", "AUTO_CLAMPED")):
+        enum_values = np.full(count, _keyframe_enum_value(prop_name, identifier), dtype=np.int32)
+        fcurve.keyframe_points.foreach_set(prop_name, enum_values)
+
+    # sorts the keyframes and recalculates the handles
+    fcurve.update()
+    return fcurve
+
+
+def bake_keyframes(obj, data_path, frames, values, interpolation="BEZIER", action_name=None):
+    """
+    Keys the data_path of the object at every frame in one go.
+
+    frames: array of shape (n,)
+    values: array of shape (n,) for a single value property,
+            or (n, array_length) for a vector property like rotation_euler
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    values = np.asarray(values, dtype=np.float32)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+
+    action = get_action(obj, action_name)
+    group = "Object Transforms" if data_path in {"location", "rotation_euler", "scale"} else None
+    return [
+        bake_fcurve(action, data_path, index, frames, values[:, index], interpolation, group)
+        for index in range(values.shape[1])
+    ]
+
+
+def rotation_frames(frame_start, frame_end, degrees_per_frame, z=0.0):
+    """
+    returns (frames, values) of a rotation_euler spinning around X and Y
+    by degrees_per_frame every frame
+    """
+    frames = np.arange(frame_start, frame_end + 1, dtype=np.float32)
+    angles = np.radians(degrees_per_frame * frames)
+    values = np.column_stack((angles, angles, np.full_like(angles, z)))
+    return frames, values
+
+
+def cyclic_rotation_action(degrees_per_frame, axes=(0, 1)):
+    """
+    returns the action turning rotation_euler around the axes by
+    degrees_per_frame, made of a single keyed turn repeated by Cycles modifiers.
+    The action is created once and shared by every object using it.
+    """
+    import math
+
+    name = f"Locki Rotate {degrees_per_frame:g} deg per frame"
+    action = bpy.data.actions.get(name)
+    if action is not None:
+        return action
+
+    action = bpy.data.actions.new(name)
+    period = 360 / abs(degrees_per_frame)
+    turn = math.copysign(2 * math.pi, degrees_per_frame)
+    for index in axes:
+        fcurve = bake_fcurve(action, "rotation_euler", index, (0.0, period), (0.0, turn),
+                             interpolation="LINEAR", group="Object Transforms")
+        cycles = fcurve.modifiers.new("CYCLES")
+        cycles.mode_before = "REPEAT_OFFSET"
+        cycles.mode_after = "REPEAT_OFFSET"
+    return action
+
+
+def play_shared_action(obj, action, frame_start, frame_end, phase=0.0):
+    """
+    Plays the shared action on the object through an NLA strip repeated
+    from frame_start to frame_end. phase shifts the part of the action the
+    strip plays, so objects sharing the action do not move in sync.
+    """
+    import math
+
+    anim_data = obj.animation_data or obj.animation_data_create()
+    anim_data.action = None
+
+    action_start, action_end = action.frame_range
+    period = action_end - action_start
+
+    track = anim_data.nla_tracks.new()
+    track.name = action.name
+    strip = track.strips.new(action.name, int(frame_start), action)
+    strip.use_sync_length = False
+    # end first, the start can not be moved past the end
+    strip.action_frame_end = action_start + phase + period
+    strip.action_frame_start = action_start + phase
+    strip.repeat = max(1.0, math.ceil((frame_end - frame_start + 1) / period))
+    return strip
+
+
+def clear_animation(obj):
+    """
+    removes the keyframes and NLA tracks of the object, keeping its action
+    so that baking again does not leave an orphan action behind
+    """
+    anim_data = obj.animation_data
+    if anim_data is None:
+        return
+    if anim_data.action is not None:
+        anim_data.action.fcurves.clear()
+    for track in list(anim_data.nla_tracks):
+        anim_data.nla_tracks.remove(track)
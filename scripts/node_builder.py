@@ -0,0 +1,110 @@
+"""
+Declarative Geometry Nodes tree builder
+
+A node tree is described by a spec:
+
+    {
+        "name": "Centerpiece",
+        "inputs": [("NodeSocketGeometry", "Geometry")],
+        "outputs": [("NodeSocketGeometry", "Geometry")],
+        "nodes": {
+            "input": {"type": "NodeGroupInput", "location": (-300, 0)},
+            "subdivide": {"type": "GeometryNodeSubdivideMesh", "inputs": {"Level": 2}},
+            "group": {"type": "GeometryNodeGroup", "node_tree": {...nested spec...}},
+            "math": {"type": "ShaderNodeMath", "props": {"operation": "MULTIPLY"}},
+            "output": {"type": "NodeGroupOutput", "location": (300, 0)},
+        },
+        "links": [("input", 0, "subdivide", "Mesh"), ("subdivide", "Mesh", "output", 0)],
+    }
+
+build_node_group() hashes the spec and returns the existing node group built
+from an identical spec instead of creating a new one. Nested group specs
+are built the same way, so when a spec changes only the groups whose spec
+changed are rebuilt, the others stay shared.
+"""
+
+import hashlib
+import json
+
+import bpy
+
+SPEC_HASH_PROP = "locki_spec_hash"
+
+GEOMETRY_SOCKETS = [("NodeSocketGeometry", "Geometry")]
+
+
+def spec_hash(spec):
+    """
+    returns a digest of the spec, identical for identical specs
+    """
+    data = json.dumps(spec, sort_keys=True, default=list)
+    return hashlib.sha1(data.encode("utf8")).hexdigest()
+
+
+def find_node_group(digest):
+    for node_group in bpy.data.node_groups:
+        if node_group.get(SPEC_HASH_PROP) == digest:
+            return node_group
+    return None
+
+
+def new_geometry_node_group(name, inputs=GEOMETRY_SOCKETS, outputs=GEOMETRY_SOCKETS):
+    """
+    creates an empty Geometry Nodes group with the given (socket type, name) sockets
+    """
+    node_tree = bpy.data.node_groups.new(name, "GeometryNodeTree")
+    for in_out, sockets in (("INPUT", inputs), ("OUTPUT", outputs)):
+        for socket_type, socket_name, *default in sockets:
+            if bpy.app.version >= (4, 0, 0):
+                socket = node_tree.interface.new_socket(socket_name, in_out=in_out, socket_type=socket_type)
+            elif in_out == "INPUT":
+                socket = node_tree.inputs.new(socket_type, socket_name)
+            else:
+                socket = node_tree.outputs.new(socket_type, socket_name)
+            if default:
+                socket.default_value = default[0]
+    return node_tree
+
+
+def _add_node(node_tree, key, node_spec):
+    node = node_tree.nodes.new(node_spec["type"])
+    node.name = key
+    # properties first, they can change the sockets of the node
+    for attr, value in node_spec.get("props", {}).items():
+        setattr(node, attr, value)
+    if "node_tree" in node_spec:
+        node.node_tree = build_node_group(node_spec["node_tree"])
+    for socket, value in node_spec.get("inputs", {}).items():
+        node.inputs[socket].default_value = value
+    node.location = node_spec.get("location", (0, 0))
+    return node
+
+
+def build_node_group(spec):
+    """
+    returns the node group described by the spec,
+    reusing the node group of an identical spec when there is one
+    """
+    digest = spec_hash(spec)
+    node_tree = find_node_group(digest)
+    if node_tree is not None:
+        return node_tree
+
+    node_tree = new_geometry_node_group(spec["name"],
+                                        spec.get("inputs", GEOMETRY_SOCKETS),
+                                        spec.get("outputs", GEOMETRY_SOCKETS))
+    nodes = {key: _add_node(node_tree, key, node_spec) for key, node_spec in spec["nodes"].items()}
+    for from_key, from_socket, to_key, to_socket in spec.get("links", ()):
+        node_tree.links.new(nodes[from_key].outputs[from_socket], nodes[to_key].inputs[to_socket])
+
+    node_tree[SPEC_HASH_PROP] = digest
+    return node_tree
+
+
+def add_node_group_modifier(obj, spec, name="GeometryNodes"):
+    """
+    adds a Geometry Nodes modifier using the (shared) node group of the spec
+    """
+    modifier = obj.modifiers.new(name, "NODES")
+    modifier.node_group = build_node_group(spec)
+    return modifier
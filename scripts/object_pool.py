@@ -0,0 +1,83 @@
+"""
+Object pools for the generators
+
+Each generator keeps its objects in a pool collection. A later run takes
+the objects it needs from the pool and re-parameterizes them, with
+foreach_set over the pool collection where possible, instead of creating
+new objects and meshes; the objects it does not need are hidden.
+"""
+
+import bmesh
+import bpy
+import numpy as np
+
+POOL_PROP = "locki_pool"
+
+
+def get_pool(name):
+    """
+    returns the pool collection of the generator, creating it if needed
+    """
+    for col in bpy.data.collections:
+        if col.get(POOL_PROP) == name:
+            break
+    else:
+        col = bpy.data.collections.new(f"Locki Pool {name}")
+        col[POOL_PROP] = name
+
+    scene_collection = bpy.context.scene.collection
+    if col.name not in scene_collection.children:
+        scene_collection.children.link(col)
+    return col
+
+
+def shared_mesh(name, build):
+    """
+    returns the mesh used by all the objects of a pool,
+    calling build(bm) to fill it the first time
+    """
+    mesh_name = f"Locki {name}"
+    mesh = bpy.data.meshes.get(mesh_name)
+    if mesh is None:
+        mesh = bpy.data.meshes.new(mesh_name)
+        bm = bmesh.new()
+        build(bm)
+        bm.to_mesh(mesh)
+        bm.free()
+    return mesh
+
+
+def acquire(name, count, factory):
+    """
+    returns count visible objects from the pool of the generator,
+    creating the missing ones with factory(); the rest of the pool is hidden
+    """
+    pool = get_pool(name)
+    for _ in range(count - len(pool.objects)):
+        pool.objects.link(factory())
+
+    hidden = np.ones(len(pool.objects), dtype=bool)
+    hidden[:count] = False
+    pool.objects.foreach_set("hide_viewport", hidden)
+    pool.objects.foreach_set("hide_render", hidden)
+    return list(pool.objects)[:count]
+
+
+def set_vectors(name, attr, values):
+    """
+    sets a vector property, like location or scale, of the first len(values)
+    objects of the pool in one foreach_set call
+    """
+    pool = get_pool(name)
+    values = np.asarray(values, dtype=np.float32).ravel()
+    buffer = np.empty(len(pool.objects) * 3, dtype=np.float32)
+    pool.objects.foreach_get(attr, buffer)
+    buffer[:values.size] = values
+    pool.objects.foreach_set(attr, buffer)
+
+
+def release(name):
+    """
+    hides all the objects of the pool, keeping them for the next run
+    """
+    acquire(name, 0, None)
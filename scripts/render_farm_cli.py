@@ -0,0 +1,26 @@
+"""
+Command line entry point of the thumbnail render farm, see render_farm.py.
+
+Usage:
+    blender --background --python <addon dir>/scripts/render_farm_cli.py -- [options]
+"""
+
+import importlib
+import os
+import sys
+
+
+def main():
+    addon_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # import the add-on by its folder name, wherever it is installed
+    sys.path.insert(0, os.path.dirname(addon_dir))
+    render_farm = importlib.import_module(os.path.basename(addon_dir) + ".render_farm")
+
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if argv[:1] == ["--worker"]:
+        sys.exit(render_farm.worker_main(argv[1:]))
+    sys.exit(render_farm.main(argv))
+
+
+if __name__ == "__main__":
+    main()
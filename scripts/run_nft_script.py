@@ -0,0 +1,38 @@
+"""
+Runs a downloaded PY NFT inside a background Blender and saves the scene
+it generates, so the interactive session can append or link it.
+
+Usage:
+    blender --background --factory-startup --python run_nft_script.py -- script.py output.blend
+"""
+
+import sys
+import traceback
+
+import bpy
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:]
+    script_path, output_path = argv[:2]
+
+    # start from an empty scene instead of the factory cube, camera and light
+    bpy.data.batch_remove(list(bpy.data.objects))
+
+    with open(script_path, "r") as f:
+        source = f.read()
+
+    status = 0
+    try:
+        exec(compile(source, script_path, "exec"), {"__name__": "__main__", "__file__": script_path})
+    except Exception:
+        # still save what was generated, the add-on reports the error
+        traceback.print_exc()
+        status = 1
+
+    bpy.ops.wm.save_as_mainfile(filepath=output_path, compress=True)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
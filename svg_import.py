@@ -0,0 +1,161 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# SVG NFT import: parsed curves are cached per content hash, and the curve
+# objects of all paths can be consolidated into one object.
+
+import bpy
+import numpy as np
+
+from . import asset_cache
+from . import batch_mode
+
+CACHE_KIND = 'svg'
+
+
+def _points_array(points, attr, width):
+    arr = np.empty(len(points) * width, dtype=np.float32)
+    points.foreach_get(attr, arr)
+    return arr.reshape(-1, width)
+
+
+def _transform(coords, matrix):
+    """Applies a 4x4 matrix to an (n, 3) array of coordinates."""
+
+    mat = np.array(matrix, dtype=np.float32)
+    return coords @ mat[:3, :3].T + mat[:3, 3]
+
+
+def simplify_mask(coords, tolerance, cyclic):
+    """Returns a boolean mask of the points to keep, dropping points closer
+    than tolerance (measured along the path) to the previously kept point.
+    """
+
+    count = len(coords)
+    keep = np.ones(count, dtype=bool)
+    if tolerance <= 0.0 or count < (4 if cyclic else 3):
+        return keep
+
+    steps = np.linalg.norm(np.diff(coords, axis=0), axis=1)
+    bins = np.floor(np.concatenate(([0.0], np.cumsum(steps))) / tolerance)
+    keep[1:] = bins[1:] != bins[:-1]
+    keep[0] = True
+    keep[-1] = True
+    if keep.sum() < (3 if cyclic else 2):
+        return np.ones(count, dtype=bool)
+    return keep
+
+
+def _copy_spline(src, curve, matrix, material_index, tolerance):
+    dst = curve.splines.new(src.type)
+    dst.use_cyclic_u = src.use_cyclic_u
+    dst.resolution_u = src.resolution_u
+    dst.material_index = material_index
+
+    if src.type == 'BEZIER':
+        points = src.bezier_points
+        coords = {attr: _transform(_points_array(points, attr, 3), matrix)
+                  for attr in ('co', 'handle_left', 'handle_right')}
+        keep = simplify_mask(coords['co'], tolerance, src.use_cyclic_u)
+        handle_types = [(p.handle_left_type, p.handle_right_type)
+                        for p, k in zip(points, keep) if k]
+
+        dst.bezier_points.add(int(keep.sum()) - 1)
+        # Handle types first, setting them may recalculate the handles.
+        for point, (left, right) in zip(dst.bezier_points, handle_types):
+            point.handle_left_type = left
+            point.handle_right_type = right
+        for attr, arr in coords.items():
+            dst.bezier_points.foreach_set(attr, arr[keep].ravel())
+    else:
+        points = src.points
+        coords = _points_array(points, 'co', 4)
+        coords[:, :3] = _transform(coords[:, :3], matrix)
+        keep = simplify_mask(coords[:, :3], tolerance, src.use_cyclic_u)
+        dst.points.add(int(keep.sum()) - 1)
+        dst.points.foreach_set('co', coords[keep].ravel())
+
+
+def join_curves(objects, name, tolerance=0.0):
+    """Copies the splines of all curve objects into a single curve object,
+    simplifying them with the given tolerance, and removes the originals.
+    """
+
+    curve_objects = [obj for obj in objects if obj.type == 'CURVE']
+    if not curve_objects:
+        return objects
+
+    first = curve_objects[0].data
+    curve = bpy.data.curves.new(name, 'CURVE')
+    curve.dimensions = first.dimensions
+    curve.fill_mode = first.fill_mode
+    curve.resolution_u = first.resolution_u
+
+    material_slots = {}
+    for obj in curve_objects:
+        for src in obj.data.splines:
+            material = None
+            if obj.data.materials and src.material_index < len(obj.data.materials):
+                material = obj.data.materials[src.material_index]
+            if material not in material_slots:
+                material_slots[material] = len(curve.materials)
+                curve.materials.append(material)
+            _copy_spline(src, curve, obj.matrix_world, material_slots[material], tolerance)
+
+    joined = bpy.data.objects.new(name, curve)
+    old_data = [obj.data for obj in curve_objects]
+    bpy.data.batch_remove(curve_objects + old_data)
+
+    return [obj for obj in objects if obj not in curve_objects] + [joined]
+
+
+def curves_to_mesh(objects):
+    """Replaces the curve objects by mesh objects of their evaluated shape."""
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    result = []
+    for obj in objects:
+        if obj.type != 'CURVE':
+            result.append(obj)
+            continue
+        # Evaluation needs the object to be in the scene.
+        bpy.context.scene.collection.objects.link(obj)
+        depsgraph.update()
+        mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph))
+        mesh_obj = bpy.data.objects.new(obj.name, mesh)
+        mesh_obj.matrix_world = obj.matrix_world
+        curve = obj.data
+        bpy.data.objects.remove(obj)
+        bpy.data.curves.remove(curve)
+        result.append(mesh_obj)
+    return result
+
+
+def import_svg(local_path, digest, join_mode='NONE', tolerance=0.0):
+    """Imports an SVG file, reusing the parsed curves cached for its content.
+
+    @param join_mode: 'NONE' to keep one curve object per SVG path, 'CURVE'
+        to join them into one curve object, 'MESH' to join and convert them
+        into one mesh object.
+    @param tolerance: point simplification distance, 0 to disable.
+    @returns: the new objects, not linked to any collection when joined.
+    """
+
+    objects = asset_cache.append_objects(digest, CACHE_KIND)
+    if objects is None:
+        objects_before = set(bpy.data.objects)
+        collections_before = set(bpy.data.collections)
+        batch_mode.run_op(bpy.ops.import_curve.svg, filepath=local_path, filter_glob="*.svg")
+        objects = [obj for obj in bpy.data.objects if obj not in objects_before]
+
+        # The importer puts the paths in a collection of their own.
+        for col in set(bpy.data.collections) - collections_before:
+            bpy.data.collections.remove(col)
+        asset_cache.write_objects(digest, CACHE_KIND, objects)
+
+    if join_mode == 'NONE':
+        return objects
+
+    name = objects[0].name if objects else 'SVG'
+    objects = join_curves(objects, name, tolerance)
+    if join_mode == 'MESH':
+        objects = curves_to_mesh(objects)
+    return objects
@@ -0,0 +1,170 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Run with: python -m unittest discover -s tests
+
+import hashlib
+import http.server
+import importlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import types
+import unittest
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+# chunkstore only needs the standard library and a requests session. A bare
+# package around the add-on folder lets it import filelock while skipping the
+# add-on's __init__, which needs bpy.
+_package = types.ModuleType('_locki_addon')
+_package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)]
+sys.modules.setdefault('_locki_addon', _package)
+chunkstore = importlib.import_module('_locki_addon.chunkstore')
+
+
+class _StreamHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.ranges.append(self.headers.get('Range'))
+        data = server.data
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range') or '')
+        if match and server.accept_ranges:
+            first, last = int(match.group(1)), min(int(match.group(2)), len(data) - 1)
+            body = data[first:last + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %i-%i/%i' % (first, last, len(data)))
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('ETag', server.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Stop(Exception):
+    pass
+
+
+@unittest.skipIf(requests is None, 'requests is not installed')
+class FetchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _StreamHandler)
+        self.server.data = bytes(range(256)) * 2 + b'tail'
+        self.server.etag = '"v1"'
+        self.server.accept_ranges = True
+        self.server.ranges = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.url = 'http://127.0.0.1:%i/stream.csv' % self.server.server_port
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+
+        chunk_size = chunkstore.CHUNK_SIZE
+        chunkstore.CHUNK_SIZE = 100
+        self.addCleanup(setattr, chunkstore, 'CHUNK_SIZE', chunk_size)
+
+    def fetch(self, check=None):
+        store = chunkstore.ChunkStore(self.directory.name, self.url)
+        return chunkstore.fetch(self.session, self.url, store, timeout=5, check=check)
+
+    def assertStored(self, store, data):
+        with store.open() as stored:
+            self.assertEqual(bytes(stored), data)
+        self.assertTrue(store.complete)
+        self.assertEqual(store.manifest['sha256'], hashlib.sha256(data).hexdigest())
+
+    def stop_after(self, count):
+        calls = []
+
+        def check():
+            if len(calls) == count:
+                raise _Stop()
+            calls.append(None)
+        return check
+
+    def test_ranges(self):
+        store = self.fetch()
+        self.assertStored(store, self.server.data)
+        self.assertEqual(store.chunk_count, 6)
+        self.assertEqual(self.server.ranges, ['bytes=%i-%i' % (i * 100, i * 100 + 99)
+                                              for i in range(6)])
+        self.assertEqual(store.manifest['content_type'], 'text/csv')
+
+    def test_no_range_support(self):
+        self.server.accept_ranges = False
+        store = self.fetch()
+        self.assertStored(store, self.server.data)
+        self.assertEqual(len(self.server.ranges), 1)
+
+    def test_resume(self):
+        with self.assertRaises(_Stop):
+            self.fetch(check=self.stop_after(2))
+        self.server.ranges.clear()
+
+        store = self.fetch()
+        self.assertStored(store, self.server.data)
+        # one byte to check the stream, then only the chunks not written yet
+        self.assertEqual(self.server.ranges, ['bytes=0-0', 'bytes=300-399',
+                                              'bytes=400-499', 'bytes=500-599'])
+
+    def test_changed_etag(self):
+        with self.assertRaises(_Stop):
+            self.fetch(check=self.stop_after(2))
+        self.server.data = b'new ' * 100
+        self.server.etag = '"v2"'
+        self.server.ranges.clear()
+
+        store = self.fetch()
+        self.assertStored(store, self.server.data)
+        self.assertEqual(store.manifest['etag'], '"v2"')
+        self.assertEqual(self.server.ranges, ['bytes=0-0'] + [
+            'bytes=%i-%i' % (i * 100, i * 100 + 99) for i in range(4)])
+
+    def test_complete_store_is_reused(self):
+        self.fetch()
+        self.server.ranges.clear()
+        store = self.fetch()
+        self.assertStored(store, self.server.data)
+        self.assertEqual(self.server.ranges, [])
+
+    def test_error_status(self):
+        url = self.url.replace('stream.csv', 'missing')
+        self.server.RequestHandlerClass = type('_Missing', (_StreamHandler,), {
+            'do_GET': lambda handler: handler.send_error(404)})
+        store = chunkstore.ChunkStore(self.directory.name, url)
+        with self.assertRaises(chunkstore.StreamError):
+            chunkstore.fetch(self.session, url, store, timeout=5)
+
+
+class ChunkStoreTest(unittest.TestCase):
+    def test_verify_forgets_corrupt_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = chunkstore.ChunkStore(directory, 'key')
+            store.reset('url', 2 * chunkstore.CHUNK_SIZE, '', '')
+            store.write_chunk(0, b'a' * chunkstore.CHUNK_SIZE)
+            store.write_chunk(1, b'b' * chunkstore.CHUNK_SIZE)
+            with open(store.data_path, 'r+b') as f:
+                f.write(b'x')
+
+            self.assertFalse(store.verify())
+            self.assertEqual(store.missing_chunks(), [0])
+            with open(store.manifest_path, 'r', encoding='utf8') as f:
+                self.assertEqual(list(json.load(f)['chunks']), ['1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
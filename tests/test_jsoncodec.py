@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Run with: python -m unittest discover -s tests
+
+import importlib.util
+import json
+import os
+import unittest
+
+# jsoncodec only needs the standard library; loading it by path skips the
+# add-on's __init__, which needs bpy.
+_spec = importlib.util.spec_from_file_location(
+    'jsoncodec', os.path.join(os.path.dirname(__file__), os.pardir, 'jsoncodec.py'))
+jsoncodec = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(jsoncodec)
+
+
+def _splits(data):
+    """Yields data cut in two at every byte position, and one byte at a time."""
+
+    for i in range(len(data) + 1):
+        yield [data[:i], data[i:]]
+    yield [data[i:i + 1] for i in range(len(data))]
+
+
+VALID = [
+    b'[]',
+    b' [ ] ',
+    b'[1.5]',
+    b'[2e3, -0.25E-2, 10]',
+    b'[1, "a,]b", {"k": [1, 2]}, null, true, false]',
+    b'[ {"identifier": "NFT-1a2b3c-01", "name": "caf\xc3\xa9 \xe2\x82\xac"} ,\n"x" ]',
+]
+
+MALFORMED = [
+    b'',
+    b'{}',
+    b'[1 2]',
+    b'[1,,2]',
+    b'[,1]',
+    b'[1,]',
+    b'[1',
+    b'[1,',
+    b'["a]',
+]
+
+
+class IterArrayTest(unittest.TestCase):
+    def test_valid_at_every_split(self):
+        for data in VALID:
+            expected = json.loads(data)
+            for chunks in _splits(data):
+                with self.subTest(chunks=chunks):
+                    self.assertEqual(list(jsoncodec.iter_array(chunks)), expected)
+
+    def test_malformed_at_every_split(self):
+        for data in MALFORMED:
+            for chunks in _splits(data):
+                with self.subTest(chunks=chunks):
+                    with self.assertRaises(ValueError):
+                        list(jsoncodec.iter_array(chunks))
+
+    def test_elements_come_before_the_end(self):
+        chunks = iter([b'[{"a": 1},', b' {"b": 2}', b']'])
+        elements = jsoncodec.iter_array(chunks)
+        self.assertEqual(next(elements), {'a': 1})
+        self.assertEqual(next(chunks), b' {"b": 2}')  # not read yet
+
+
+if __name__ == '__main__':
+    unittest.main()
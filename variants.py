@@ -0,0 +1,249 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# Seeded batch generation of variants of a generative script.
+#
+# Every (seed, parameter set) pair is generated in a fresh scene of a
+# background Blender worker and saved to its own .blend or .glb. The
+# manifest.json in the output directory maps the key of each variant, a hash
+# of its generator, seed and parameters, to its file and output hash.
+# Variants whose key is already in the manifest are skipped.
+#
+# Usage:
+#     blender --background --python scripts/batch_variants_cli.py -- \
+#         --generator rotating_cube --seeds 1-500 --output /path/to/variants
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+import bpy
+
+from . import background
+
+log = logging.getLogger(__name__)
+
+CLI_SCRIPT = os.path.join(os.path.dirname(__file__), 'scripts', 'batch_variants_cli.py')
+MANIFEST_NAME = 'manifest.json'
+EXTENSIONS = {'BLEND': '.blend', 'GLB': '.glb'}
+
+
+def _generator_centerpiece(seed, **params):
+    from .scripts import clean_scene
+    clean_scene.main(seed)
+
+
+def _generator_rotating_cube(seed, **params):
+    from .scripts import clean_scene, get_scripts
+    clean_scene.scene_setup(seed)
+    get_scripts.add_rotating_cube_obj(
+        center=params.get('center', (0, 0, 0)), num_cubes=params.get('num_cubes', 10),
+        radius=params.get('radius', 5.0), size=params.get('size', 1.0),
+        rotation=params.get('rotation', 4), array_mode=params.get('array_mode', 'OBJECTS'),
+        animation=params.get('animation', 'BAKED'), phase_step=params.get('phase_step', 0.0))
+
+
+def _generator_monkey(seed, **params):
+    from .scripts import clean_scene, get_scripts
+    clean_scene.scene_setup(seed)
+    get_scripts.add_subdiv_monkey_obj(
+        params.get('size', 4.0), params.get('subdiv_viewport_levels', 1),
+        params.get('subdiv_render_levels', 3), params.get('shade_smooth', True))
+
+
+# Built-in generators, by name; any other generative script is given by path.
+GENERATORS = {
+    'centerpiece': _generator_centerpiece,
+    'rotating_cube': _generator_rotating_cube,
+    'monkey': _generator_monkey,
+}
+
+
+def parse_seeds(text):
+    """Parses '1-500', '1,2,7' or a mix like '1-10,42' into a list of seeds."""
+
+    seeds = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part[1:]:
+            start, end = part.split('-', 1)
+            seeds.extend(range(int(start), int(end) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def variant_key(generator, seed, params):
+    """Returns the manifest key of a variant, a hash of what it is generated from."""
+
+    data = json.dumps([generator, seed, params], sort_keys=True)
+    return hashlib.sha256(data.encode('utf8')).hexdigest()
+
+
+def plan_variants(seeds, param_sets, generator):
+    """Returns one variant per (seed, parameter set) combination.
+
+    @param generator: name of the built-in generator, or hash of the script.
+    """
+
+    variants = []
+    for params_index, params in enumerate(param_sets):
+        for seed in seeds:
+            key = variant_key(generator, seed, params)
+            name = 'seed%06d' % seed
+            if len(param_sets) > 1:
+                name = 'params%03d_%s' % (params_index, name)
+            # the key in the name keeps other parameters from overwriting the file
+            name = '%s_%s' % (name, key[:8])
+            variants.append(dict(key=key, name=name, seed=seed, params=params))
+    return variants
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf8') as f:
+        return json.load(f)
+
+
+def write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+################################################################
+# coordinator
+################################################################
+
+
+def _generate_chunk(variants, settings, job_dir):
+    fd, job_file = tempfile.mkstemp(suffix='.json', dir=job_dir)
+    with os.fdopen(fd, 'w', encoding='utf8') as f:
+        json.dump(dict(settings, variants=variants), f)
+
+    process = background.start_process(
+        background.blender_command(CLI_SCRIPT, '--worker', job_file),
+        job_file + '.log')
+    process.wait()
+
+    results = {}
+    for variant in variants:
+        path = os.path.join(settings['output'], variant['name'] + EXTENSIONS[settings['format']])
+        if os.path.exists(path):
+            results[variant['key']] = dict(name=variant['name'], generator=settings['generator'],
+                                           seed=variant['seed'], params=variant['params'],
+                                           file=os.path.basename(path), hash=file_hash(path))
+    return results
+
+
+def main(argv):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    parser = argparse.ArgumentParser(
+        prog='batch_variants', description='Generate seeded variants of a generative script.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--script', help='path of the generative Python script')
+    source.add_argument('--generator', choices=sorted(GENERATORS), help='built-in generator')
+    parser.add_argument('--seeds', required=True, help="e.g. '1-500' or '3,7,42'")
+    parser.add_argument('--params', default='[{}]',
+                        help='JSON list of parameter sets, or the path of a JSON file')
+    parser.add_argument('--format', choices=sorted(EXTENSIONS), default='BLEND')
+    parser.add_argument('--output', required=True, help='output directory')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=4,
+                        help='variants generated per Blender process start')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.params):
+        with open(args.params, 'r', encoding='utf8') as f:
+            param_sets = json.load(f)
+    else:
+        param_sets = json.loads(args.params)
+
+    output = os.path.abspath(args.output)
+    os.makedirs(output, exist_ok=True)
+    manifest = read_manifest(output)
+    # an edited script is a new generator, its variants are generated again
+    generator = args.generator or file_hash(args.script)
+    variants = [v for v in plan_variants(parse_seeds(args.seeds), param_sets, generator)
+                if v['key'] not in manifest]
+    print('%d variants to generate with %d workers' % (len(variants), args.workers))
+
+    settings = dict(script=args.script and os.path.abspath(args.script),
+                    generator=args.generator, format=args.format, output=output)
+    chunks = [variants[i:i + args.chunk] for i in range(0, len(variants), args.chunk)]
+    started = time.monotonic()
+    generated = 0
+    with tempfile.TemporaryDirectory(prefix='locki_variants_') as job_dir, \
+            ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(_generate_chunk, chunk, settings, job_dir) for chunk in chunks]
+        for future in as_completed(futures):
+            results = future.result()
+            manifest.update(results)
+            write_manifest(output, manifest)
+            generated += len(results)
+            print('%d/%d generated (%.0fs)' % (generated, len(variants), time.monotonic() - started))
+
+    return 0 if generated == len(variants) else 1
+
+
+################################################################
+# worker
+################################################################
+
+
+def generate_variant(settings, variant, path):
+    # A file left by an interrupted run must not be taken for this one.
+    if os.path.exists(path):
+        os.remove(path)
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    seed = variant['seed']
+    random.seed(seed)
+
+    if settings['generator']:
+        GENERATORS[settings['generator']](seed, **variant['params'])
+    else:
+        script = settings['script']
+        with open(script, 'r') as f:
+            source = f.read()
+        # Scripts read their seed and parameters from these globals.
+        exec(compile(source, script, 'exec'),
+             {'__name__': '__main__', '__file__': script,
+              'SEED': seed, 'PARAMS': variant['params']})
+
+    if settings['format'] == 'GLB':
+        bpy.ops.export_scene.gltf(filepath=path, export_format='GLB')
+    else:
+        bpy.ops.wm.save_as_mainfile(filepath=path, compress=True, copy=True)
+
+
+def worker_main(argv):
+    with open(argv[0], 'r', encoding='utf8') as f:
+        settings = json.load(f)
+
+    failed = 0
+    for variant in settings.pop('variants'):
+        path = os.path.join(settings['output'], variant['name'] + EXTENSIONS[settings['format']])
+        try:
+            generate_variant(settings, variant, path)
+        except Exception:
+            log.exception('Error generating %s', variant['name'])
+            failed += 1
+    return 1 if failed else 0